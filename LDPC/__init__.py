@@ -1,15 +1,31 @@
-from .encoder import encode_random_message, encode, add_gaussian_noise
-from .decoder import decode, get_message, decode_LLR, decoder_init, BER, fc,interleaver,deinterleaver
+from .encoder import (encode_random_message, encode, add_gaussian_noise,
+                      encode_groups, encode_stream, stream2groups)
+from .decoder import (decode, get_message, decode_LLR, decoder_init, BER, fc,
+                      fc_numba, interleaver, deinterleaver, LDPCDecoder)
 from .code import (parity_check_matrix, coding_matrix_systematic,
-                   make_ldpc, coding_matrix)
+                   make_ldpc, coding_matrix, irregular_parity_check_matrix)
+from .registry import get_ldpc, get_decoder, get_coding_matrix
+from .qc import QCLDPC, QCDecoder
+from .frame import FrameLayout
+from .shared import SharedCode
 from .utils import binaryproduct, incode, binaryrank
+from .utils_bits import int2bits, bits2int
 from . import ldpc_images, ldpc_audio
+from . import evaluation
 from . import utils
+from . import gf2
+from . import qc
+from . import shared
+from . import instrument
 from ._version import __version__
 
 __all__ = ['binaryproduct', 'incode', 'binaryrank', 'encode_random_message',
-           'encode', 'decode', 'get_message', 'parity_check_matrix',
-           'construct_regularh', 'ldpc_audio', 'ldpc_images',
-           'coding_matrix', 'coding_matrix_systematic', 'make_ldpc', 'utils',
-           'decoder_init', 'decode_LLR', 'add_gaussian_noise', 'BER', 'fc','interleaver','deinterleaver',
+           'encode', 'encode_groups', 'encode_stream', 'stream2groups',
+           'decode', 'get_message', 'parity_check_matrix',
+           'irregular_parity_check_matrix',
+           'construct_regularh', 'ldpc_audio', 'ldpc_images', 'evaluation',
+           'coding_matrix', 'coding_matrix_systematic', 'make_ldpc', 'get_ldpc', 'get_decoder', 'get_coding_matrix', 'utils', 'gf2',
+           'qc', 'QCLDPC', 'QCDecoder', 'FrameLayout', 'shared', 'SharedCode', 'instrument',
+           'decoder_init', 'decode_LLR', 'LDPCDecoder', 'add_gaussian_noise', 'BER', 'fc', 'fc_numba', 'interleaver','deinterleaver',
+           'int2bits', 'bits2int',
            '__version__']
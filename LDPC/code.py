@@ -1,10 +1,14 @@
 """Coding module."""
+import warnings
+
 import numpy as np
+from numba import njit
 from scipy.sparse import csr_matrix
 from . import utils
+from . import gf2
 
 
-def parity_check_matrix(n_code, d_v, d_c, seed=None):
+def parity_check_matrix(n_code, d_v, d_c, seed=None, sparse=False):
     """
     Build a regular Parity-Check Matrix H following Callager's algorithm.
 
@@ -16,6 +20,8 @@ def parity_check_matrix(n_code, d_v, d_c, seed=None):
     d_c: int, Number of bits in the same parity-check equation. d_c Must be
         greater or equal to d_v and must divide n.
     seed: int, seed of the random generator.
+    sparse: boolean, default False. If True, H is built directly as a
+        scipy.sparse.csr_matrix, without any dense allocation.
 
     Returns
     -------
@@ -36,25 +42,252 @@ def parity_check_matrix(n_code, d_v, d_c, seed=None):
         raise ValueError("""d_c must divide n for a regular LDPC matrix H.""")
 
     n_equations = (n_code * d_v) // d_c
-
-    block = np.zeros((n_equations // d_v, n_code), dtype=int)
-    H = np.empty((n_equations, n_code))
     block_size = n_equations // d_v
 
-    # Filling the first block with consecutive ones in each row of the block
+    # The first block has d_c consecutive ones in each row: bit j is in
+    # equation j // d_c. The remaining blocks are permutations of the first
+    # block's columns.
+    rows = np.empty((d_v, n_code), dtype=np.int64)
+    rows[0] = np.arange(n_code) // d_c
+    for i in range(1, d_v):
+        rows[i] = i * block_size + rng.permutation(n_code) // d_c
 
-    for i in range(block_size):
-        for j in range(i * d_c, (i+1) * d_c):
-            block[i, j] = 1
-    H[:block_size] = block
+    cols = np.broadcast_to(np.arange(n_code), (d_v, n_code))
+    H = csr_matrix((np.ones(d_v * n_code, dtype=int),
+                    (rows.ravel(), cols.ravel())),
+                   shape=(n_equations, n_code))
+    if not sparse:
+        H = H.toarray()
+    return H
 
-    # reate remaining blocks by permutations of the first block's columns:
-    for i in range(1, d_v):
-        H[i * block_size: (i + 1) * block_size] = rng.permutation(block.T).T
-    H = H.astype(int)
+
+def _degree_sequence(degrees, n_nodes, n_edges=None):
+    """Turn a degree specification into a sequence of n_nodes degrees.
+
+    degrees can be an int, a sequence of n_nodes ints or a dict
+    {degree: fraction of nodes} (node-perspective distribution). If None,
+    the n_edges edges are spread as evenly as possible.
+    """
+    if degrees is None:
+        seq = np.full(n_nodes, n_edges // n_nodes, dtype=np.int64)
+        seq[:n_edges % n_nodes] += 1
+        return seq
+    if isinstance(degrees, dict):
+        values = np.array(sorted(degrees), dtype=np.int64)
+        fractions = np.array([degrees[d] for d in sorted(degrees)], float)
+        counts = np.floor(fractions / fractions.sum() * n_nodes).astype(int)
+        # give the rounding leftovers to the largest fractional parts
+        rest = fractions / fractions.sum() * n_nodes - counts
+        counts[np.argsort(-rest)[:n_nodes - counts.sum()]] += 1
+        return np.repeat(values, counts)
+    seq = np.asarray(degrees, dtype=np.int64)
+    if seq.ndim == 0:
+        return np.full(n_nodes, int(seq), dtype=np.int64)
+    if seq.size != n_nodes:
+        raise ValueError("Expected %d degrees, got %d." % (n_nodes, seq.size))
+    return seq
+
+
+def irregular_parity_check_matrix(n_code, n_equations, var_degrees,
+                                  check_degrees=None, seed=None, peg=False,
+                                  max_depth=None):
+    """Build a sparse irregular Parity-Check Matrix H.
+
+    Edges are either matched at random between bit and check sockets
+    (configuration model) or placed by progressive edge growth (PEG), which
+    greedily maximizes the local girth of every bit.
+
+    Parameters
+    ----------
+    n_code: int, Length of the codewords.
+    n_equations: int, Number of parity-check equations.
+    var_degrees: int, sequence (n_code,) or dict {degree: fraction}.
+        Number of parity-check equations including each bit.
+    check_degrees: int, sequence (n_equations,) or dict {degree: fraction},
+        default None. Number of bits in each equation; if None, the edges
+        are spread as evenly as possible. Ignored by PEG, which keeps check
+        degrees balanced.
+    seed: int, seed of the random generator.
+    peg: boolean, default False. If True, use progressive edge growth.
+    max_depth: int, default None. PEG only: limit of the tree expansion
+        around each bit; if None, it goes on until no new check is reached
+        (full PEG). Full PEG time grows about quadratically with the number
+        of edges, e.g. 1 s for n_code = 4000 and 20 s for 16000 with
+        {2: 0.5, 3: 0.3, 8: 0.2}; max_depth=3 cuts these to 0.35 s and 2 s
+        but builds codes with shorter cycles, which decode markedly worse.
+        The first PEG call of a process also compiles the numba kernel
+        (about 10 s), unless numba's on-disk cache is already warm.
+
+    Returns
+    -------
+    H: scipy.sparse.csr_matrix (n_equations, n_code).
+
+    """
+    rng = utils.check_random_state(seed)
+
+    var_seq = _degree_sequence(var_degrees, n_code)
+    if (var_seq < 1).any() or var_seq.max() > n_equations:
+        raise ValueError("Bit degrees must be between 1 and n_equations.")
+    n_edges = var_seq.sum()
+
+    if peg:
+        order = np.argsort(var_seq, kind="stable")
+        tie_break = rng.permutation(n_equations)
+        rows, cols = _peg(var_seq, order, n_equations, tie_break,
+                          -1 if max_depth is None else max_depth)
+    else:
+        check_seq = _degree_sequence(check_degrees, n_equations, n_edges)
+        if check_seq.sum() != n_edges:
+            raise ValueError("Bit and check degrees must sum to the same "
+                             "number of edges, got %d and %d."
+                             % (n_edges, check_seq.sum()))
+        cols = np.repeat(np.arange(n_code), var_seq)
+        rows = rng.permutation(np.repeat(np.arange(n_equations), check_seq))
+        rows = _remove_multi_edges(rows, cols, n_equations, rng)
+
+    H = csr_matrix((np.ones(len(rows), dtype=int), (rows, cols)),
+                   shape=(n_equations, n_code))
+    H.sum_duplicates()
+    H.data[:] = 1
     return H
 
 
+def _remove_multi_edges(rows, cols, n_equations, rng, max_rounds=100):
+    """Swap the check sockets of repeated (check, bit) edges at random.
+
+    Edges still repeated after `max_rounds` rounds are left in place, with a
+    warning: they are merged into single edges of H, which then has lower
+    degrees than requested.
+    """
+    rows = rows.copy()
+    for n_round in range(max_rounds + 1):
+        keys = rows * (cols.max() + 1) + cols
+        _, first = np.unique(keys, return_index=True)
+        repeated = np.setdiff1d(np.arange(len(rows)), first)
+        if not repeated.size:
+            break
+        if n_round == max_rounds:
+            warnings.warn("%d repeated edges are left after %d rounds and are "
+                          "merged: some nodes of H have lower degrees than "
+                          "requested." % (repeated.size, max_rounds))
+            break
+        others = rng.randint(len(rows), size=repeated.size)
+        rows[repeated], rows[others] = rows[others], rows[repeated].copy()
+    return rows
+
+
+@njit(cache=True)
+def _peg(var_seq, order, n_equations, tie_break, max_depth):
+    """Progressive edge growth.
+
+    Bits are processed in `order`. Each edge of a bit goes to a lowest degree
+    check among those farthest from the bit in the current graph:
+    unreachable ones if any, else those reached last by the tree expansion.
+    Checks are kept sorted by degree in buckets so that the lowest degree
+    unreachable check is found without scanning all of them.
+    """
+    n_code = var_seq.shape[0]
+    n_edges = var_seq.sum()
+    max_dv = var_seq.max()
+    var_checks = np.full((n_code, max_dv), -1, dtype=np.int64)
+    var_count = np.zeros(n_code, dtype=np.int64)
+    cap = 2 * (n_edges // n_equations + 1)
+    check_vars = np.full((n_equations, cap), -1, dtype=np.int64)
+    check_count = np.zeros(n_equations, dtype=np.int64)
+
+    # checks sorted by degree; bucket d is sorted[start[d]:start[d + 1]]
+    sorted_checks = np.argsort(tie_break)
+    position = np.empty(n_equations, dtype=np.int64)
+    position[sorted_checks] = np.arange(n_equations)
+    start = np.full(n_edges + 2, n_equations, dtype=np.int64)
+    start[0] = 0
+
+    check_stamp = np.zeros(n_equations, dtype=np.int64)
+    var_stamp = np.zeros(n_code, dtype=np.int64)
+    frontier = np.empty(n_equations, dtype=np.int64)
+    new_frontier = np.empty(n_equations, dtype=np.int64)
+
+    rows = np.empty(n_edges, dtype=np.int64)
+    cols = np.empty(n_edges, dtype=np.int64)
+    n_placed = 0
+    stamp = 0
+
+    for j in order:
+        for k in range(var_seq[j]):
+            stamp += 1
+            var_stamp[j] = stamp
+            n_front = 0
+            for kk in range(var_count[j]):
+                c = var_checks[j, kk]
+                check_stamp[c] = stamp
+                frontier[n_front] = c
+                n_front += 1
+            n_reached = n_front
+            best = -1
+            depth = 0
+            while n_front and (max_depth < 0 or depth < max_depth):
+                n_new = 0
+                for f in range(n_front):
+                    c = frontier[f]
+                    for vv in range(check_count[c]):
+                        v = check_vars[c, vv]
+                        if var_stamp[v] == stamp:
+                            continue
+                        var_stamp[v] = stamp
+                        for cc in range(var_count[v]):
+                            c2 = var_checks[v, cc]
+                            if check_stamp[c2] != stamp:
+                                check_stamp[c2] = stamp
+                                new_frontier[n_new] = c2
+                                n_new += 1
+                if n_reached + n_new == n_equations:
+                    # every check is reachable: take the farthest ones
+                    for f in range(n_new):
+                        c = new_frontier[f]
+                        if best < 0 or check_count[c] < check_count[best] or (
+                                check_count[c] == check_count[best] and
+                                position[c] < position[best]):
+                            best = c
+                    break
+                n_reached += n_new
+                frontier, new_frontier = new_frontier, frontier
+                n_front = n_new
+                depth += 1
+            if best < 0:
+                for p in range(n_equations):
+                    if check_stamp[sorted_checks[p]] != stamp:
+                        best = sorted_checks[p]
+                        break
+            if best < 0:
+                # all checks are neighbours of j already
+                raise ValueError("Bit degree larger than n_equations.")
+
+            d = check_count[best]
+            if d == check_vars.shape[1]:
+                grown = np.full((n_equations, 2 * d), -1, dtype=np.int64)
+                grown[:, :d] = check_vars
+                check_vars = grown
+            # move best to the end of its bucket, which then becomes the
+            # beginning of bucket d + 1
+            last = start[d + 1] - 1
+            other = sorted_checks[last]
+            sorted_checks[last] = best
+            sorted_checks[position[best]] = other
+            position[other] = position[best]
+            position[best] = last
+            start[d + 1] -= 1
+
+            check_vars[best, d] = j
+            check_count[best] += 1
+            var_checks[j, var_count[j]] = best
+            var_count[j] += 1
+            rows[n_placed] = best
+            cols[n_placed] = j
+            n_placed += 1
+
+    return rows, cols
+
+
 def coding_matrix(H, sparse=True):
     """Return the generating coding matrix G given the LDPC matrix H.
 
@@ -101,80 +334,42 @@ def coding_matrix_systematic(H, sparse=True):
 
     Parameters
     ----------
-    H: array (n_equations, n_code). Parity-check matrix.
-    sparse: (boolean, default True): if `True`, scipy.sparse is used
-    to speed up computation if n_code > 1000.
+    H: array or scipy.sparse.csr_matrix (n_equations, n_code). Parity-check
+        matrix.
+    sparse: (boolean, default True): kept for compatibility, the column
+        permutations are applied by indexing.
 
     Returns
     -------
     H_new: (n_equations, n_code) array. Modified parity-check matrix given by a
-        permutation of the columns of the provided H.
+        permutation of the columns of the provided H. Sparse if H is.
     G_systematic.T: Transposed Systematic Coding matrix associated to H_new.
 
     """
     n_equations, n_code = H.shape
 
-    if n_code > 1000 or sparse:
-        sparse = True
-    else:
-        sparse = False
-
-    P1 = np.identity(n_code, dtype=int)
+    Hrowreduced, pivots = gf2.rref(gf2.pack(H), n_code)
+    rank = len(pivots)
 
-    Hrowreduced = utils.gaussjordan(H)
+    n_bits = n_code - rank
 
-    n_bits = n_code - sum([a.any() for a in Hrowreduced])
+    # Swapping column i with the pivot column of row i, for each row in
+    # order, gives Hrowreduced the form H_ss : | I_(n-k)  A |
+    perm = np.arange(n_code)
+    for i, j in enumerate(pivots):
+        perm[i], perm[j] = perm[j], perm[i]
 
-    # After this loop, Hrowreduced will have the form H_ss : | I_(n-k)  A |
-
-    while(True):
-        zeros = [i for i in range(min(n_equations, n_code))
-                 if not Hrowreduced[i, i]]
-        if len(zeros):
-            indice_colonne_a = min(zeros)
-        else:
-            break
-        list_ones = [j for j in range(indice_colonne_a + 1, n_code)
-                     if Hrowreduced[indice_colonne_a, j]]
-        if len(list_ones):
-            indice_colonne_b = min(list_ones)
-        else:
-            break
-        aux = Hrowreduced[:, indice_colonne_a].copy()
-        Hrowreduced[:, indice_colonne_a] = Hrowreduced[:, indice_colonne_b]
-        Hrowreduced[:, indice_colonne_b] = aux
-
-        aux = P1[:, indice_colonne_a].copy()
-        P1[:, indice_colonne_a] = P1[:, indice_colonne_b]
-        P1[:, indice_colonne_b] = aux
-
-    # Now, Hrowreduced has the form: | I_(n-k)  A | ,
-    # the permutation above makes it look like :
+    # then a rotation of the columns makes it look like :
     # |A  I_(n-k)|
+    sigma = np.concatenate((perm[rank:], perm[:rank]))
 
-    P1 = P1.T
-    identity = list(range(n_code))
-    sigma = identity[n_code - n_bits:] + identity[:n_code - n_bits]
-
-    P2 = np.zeros(shape=(n_code, n_code), dtype=int)
-    P2[identity, sigma] = np.ones(n_code)
-
-    if sparse:
-        P1 = csr_matrix(P1)
-        P2 = csr_matrix(P2)
-        H = csr_matrix(H)
-
-    P = utils.binaryproduct(P2, P1)
-
-    if sparse:
-        P = csr_matrix(P)
+    H_new = H[:, sigma]
 
-    H_new = utils.binaryproduct(H, np.transpose(P))
+    A = gf2.unpack(Hrowreduced[:rank], n_code, np.uint8)[:, perm[rank:]]
 
     G_systematic = np.zeros((n_bits, n_code), dtype=int)
     G_systematic[:, :n_bits] = np.identity(n_bits)
-    G_systematic[:, n_bits:] = \
-        (Hrowreduced[:n_code - n_bits, n_code - n_bits:]).T
+    G_systematic[:, n_bits:] = A.T
 
     return H_new, G_systematic.T
 
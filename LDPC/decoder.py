@@ -1,37 +1,68 @@
 """Decoding module."""
+import copy
+import sys
 import numpy as np
 import warnings
+from contextlib import contextmanager
 
-import torch
-
-from . import utils
-
-from numba import njit, int64, types, float64
-
-
-def fc(LLR, rho, LLR_limit=50, Lp_target=None):
-    # LLR_limit = abs(Lp_target[:LLR.shape[0], :]) * 0.9
-    # idx = np.where(abs(LLR) - LLR_limit > 0)
-    # LLR[idx] = np.sign(LLR[idx]) * LLR_limit[idx]
-    # scale = min(1, (Lp_target ** 2).sum() / (Lp_target ** 2).sum()/2)
-    # LLR *= scale
-    # LLR_limit =abs(Lp_target)/2
-    # LLR_limit =min(100, max(abs(Lp_target)))
-    LLR_limit=torch.tensor(LLR_limit, dtype=torch.float32)
-    LLR = torch.tensor(LLR, dtype=torch.float32)
-    # idx = np.where(LLR < -LLR_limit)
-    # LLR[idx] = -LLR_limit
-    # print("idx1:",LLR)
-    idx = np.where(LLR > LLR_limit)
-    LLR[idx] = LLR_limit
-    # print("idx2:",idx,LLR)
-    a = (1 - rho) * np.exp(LLR) + rho
-    b = (1 - rho) + rho * np.exp(LLR)
-    idx = np.where(a > 1e-3)
-    LLR[idx] = torch.tensor(np.log(a[idx] / b[idx]), dtype=torch.float32)
-    # print("idx3:",idx,LLR)
+from . import instrument, utils
 
-    return LLR
+from numba import (njit, prange, int8, int32, int64, types, float32,
+                   float64, boolean, get_num_threads, set_num_threads,
+                   config)
+
+
+def fc(LLR, rho, LLR_limit=50, Lp_target=None, out=None):
+    """Pass LLR through a binary symmetric channel of crossover rho.
+
+    Computes log(((1 - rho) e^L + rho) / ((1 - rho) + rho e^L)) after
+    clipping L at LLR_limit, in log-sum-exp form so that it neither
+    overflows for large LLR nor loses precision for small rho.
+
+    Parameters
+    ----------
+    LLR: numpy array or torch tensor. Input LLR; integer inputs are
+        converted to float32.
+    rho: float or array broadcastable to LLR (e.g. one crossover
+        probability per codeword column).
+    LLR_limit: float, default 50. Upper clipping level of the input LLR.
+    Lp_target: unused, kept for compatibility.
+    out: array or tensor of the type of LLR, default None. Where to write
+        the result; pass LLR itself to run in place.
+
+    Returns
+    -------
+    L: numpy array or torch tensor, same type as LLR.
+
+    """
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.is_tensor(LLR):
+        if not LLR.is_floating_point():
+            LLR = LLR.to(torch.float32)
+        rho = torch.as_tensor(rho, dtype=LLR.dtype, device=LLR.device)
+        log_rho = torch.log(rho)
+        log_1mrho = torch.log1p(-rho)
+        L = torch.clamp(LLR, max=LLR_limit, out=out)
+        # log((1 - rho) + rho e^L), computed before L is overwritten
+        t = torch.logaddexp(L + log_rho, log_1mrho)
+        torch.add(L, log_1mrho, out=L)
+        torch.logaddexp(L, log_rho, out=L)
+        return L.sub_(t)
+
+    LLR = np.asarray(LLR)
+    if LLR.dtype.kind != "f":
+        LLR = LLR.astype(np.float32)
+    rho = np.asarray(rho, dtype=LLR.dtype)
+    with np.errstate(divide="ignore"):
+        log_rho = np.log(rho)
+    log_1mrho = np.log1p(-rho)
+    L = np.minimum(LLR, LLR_limit, out=out, dtype=LLR.dtype)
+    t = np.add(L, log_rho)
+    np.logaddexp(t, log_1mrho, out=t)
+    np.add(L, log_1mrho, out=L)
+    np.logaddexp(L, log_rho, out=L)
+    L -= t
+    return L
 
 
 def interleaver(x, patten=None, seed=None):
@@ -63,10 +94,379 @@ def BER(x, y):
     return abs(x - y).sum() / x.size
 
 
-def decode(H, y, snr, maxiter=1000):
+ALGORITHMS = {"sum-product": 0, "min-sum": 1, "normalized-min-sum": 2,
+              "offset-min-sum": 3}
+
+
+def _check_rule(algorithm):
+    """Return the kernel code of a check-node update rule."""
+    if algorithm not in ALGORITHMS:
+        raise ValueError("algorithm must be one of %s, got %r."
+                         % (list(ALGORITHMS), algorithm))
+    return ALGORITHMS[algorithm]
+
+
+SCHEDULES = ("flooding", "layered")
+
+# codewords decoded per solver run, larger batches are split in blocks
+_BLOCK_MESSAGES = 256
+
+DTYPES = ("float64", "float32", "int8")
+
+
+def _check_dtype(dtype):
+    """Return the numpy dtype of the decoder messages."""
+    dtype = np.dtype(dtype)
+    if dtype.name not in DTYPES:
+        raise ValueError("dtype must be one of %s, got %r."
+                         % (list(DTYPES), dtype.name))
+    return dtype
+
+
+def _select_solver(schedule, n_threads=None, dtype=np.float64):
+    """Return the kernel running one iteration of the given schedule."""
+    if schedule not in SCHEDULES:
+        raise ValueError("schedule must be one of %s, got %r."
+                         % (list(SCHEDULES), schedule))
+    if np.dtype(dtype) == np.int8:
+        if n_threads is not None:
+            raise ValueError("The fixed-point solvers are not "
+                             "multi-threaded, n_threads must be None.")
+        if schedule == "layered":
+            return _logbp_fixed_layered
+        return _logbp_fixed
+    if n_threads is None:
+        if schedule == "layered":
+            return _logbp_numba_layered
+        return _logbp_numba
+    if schedule == "layered":
+        return _logbp_numba_layered_parallel
+    return _logbp_numba_parallel
+
+
+def _check_threads(n_threads):
+    """Check a thread count of the parallel solvers (None, -1 or 1 to
+    NUMBA_NUM_THREADS)."""
+    if n_threads is None or n_threads == -1:
+        return
+    if not 1 <= n_threads <= config.NUMBA_NUM_THREADS:
+        raise ValueError("n_threads must be between 1 and %d (numba's "
+                         "thread pool, set by the NUMBA_NUM_THREADS "
+                         "environment variable) or -1, got %r."
+                         % (config.NUMBA_NUM_THREADS, n_threads))
+
+
+@contextmanager
+def _numba_threads(n_threads):
+    """Run the parallel solvers with `n_threads` threads (-1: all cores)."""
+    if n_threads is None:
+        yield
+        return
+    if n_threads == -1:
+        n_threads = config.NUMBA_NUM_THREADS
+    previous = get_num_threads()
+    set_num_threads(n_threads)
+    try:
+        yield
+    finally:
+        set_num_threads(previous)
+
+
+class LDPCDecoder:
+    """Belief propagation decoder of an LDPC code, built once and reused.
+
+    The edge indices of H, its degree profile, the solver and the message
+    buffers are set up at construction, so that decoding many frames with
+    the same code has no per-call setup cost. The message buffers are
+    reused between calls: use one decoder per thread (see `configure`).
+
+    Parameters
+    ----------
+    H: array or scipy.sparse.csr_matrix (n_equations, n_code). Parity-check
+        matrix.
+    algorithm: str, default "sum-product". Check-node update rule, one of
+        "sum-product" (exact tanh rule), "min-sum", "normalized-min-sum"
+        and "offset-min-sum".
+    alpha: float, default 0.8. Scaling factor of normalized min-sum.
+    beta: float, default 0.5. Offset of offset min-sum.
+    schedule: str, default "flooding". Message-passing schedule: "flooding"
+        updates all check nodes then all bit nodes; "layered" updates the a
+        posteriori LLR right after each check row, which typically needs
+        about half as many iterations.
+    n_threads: int, default None. If set, the multi-threaded solvers are used
+        with this number of threads (-1 for all cores).
+    dtype: str or numpy dtype, default "float64". Precision of the LLR and
+        messages: "float64", "float32" (half the memory traffic) or "int8",
+        a fixed-point mode where the LLR are quantized to `llr_bits` bits
+        with a step of `llr_step`, as in hardware decoders. The fixed-point
+        mode only supports the min-sum rules and a single thread.
+    llr_bits: int, default 8. Number of bits of the fixed-point LLR,
+        between 2 and 8.
+    llr_step: float, default 0.25. LLR value of one unit of the fixed-point
+        LLR. Messages saturate at +/- (2 ** (llr_bits - 1) - 1) units.
+    edges: tuple of arrays, default None. Precomputed edge indices
+        (row_ptr, edge_var, col_ptr, col_edges) of H, e.g. the `edges` of
+        another decoder attached from shared memory; if None, they are
+        computed from H.
+
+    """
+
+    def __init__(self, H, algorithm="sum-product", alpha=0.8, beta=0.5,
+                 schedule="flooding", n_threads=None, dtype="float64",
+                 llr_bits=8, llr_step=0.25, edges=None):
+        self.H = H
+        self.m, self.n = H.shape
+        if edges is None:
+            edges = utils._edges(H)
+        self.row_ptr, self.edge_var, self.col_ptr, self.col_edges = edges
+        self.n_edges = self.edge_var.size
+
+        self.check_degrees = np.diff(self.row_ptr)
+        self.bit_degrees = np.diff(self.col_ptr)
+        self.regular = (np.unique(self.check_degrees).size == 1 and
+                        np.unique(self.bit_degrees).size == 1)
+
+        self.algorithm = algorithm
+        self.alpha = alpha
+        self.beta = beta
+        self.schedule = schedule
+        self.n_threads = n_threads
+        self.dtype = dtype
+        self.llr_bits = llr_bits
+        self.llr_step = llr_step
+        self._setup()
+
+    def _setup(self):
+        """Check the solver settings and select the kernel."""
+        self._rule = _check_rule(self.algorithm)
+        _check_threads(self.n_threads)
+        self.dtype = _check_dtype(self.dtype)
+        self.solver = _select_solver(self.schedule, self.n_threads,
+                                     self.dtype)
+        self._kernel_params = (self._rule, self.alpha, self.beta)
+        if self.dtype == np.int8:
+            if self._rule == 0:
+                raise ValueError("The fixed-point mode requires a min-sum "
+                                 "algorithm.")
+            if not 2 <= self.llr_bits <= 8:
+                raise ValueError("llr_bits must be between 2 and 8, got %s."
+                                 % self.llr_bits)
+            self._llr_max = 2 ** (self.llr_bits - 1) - 1
+            # the offset of offset min-sum in units of the fixed-point LLR
+            self._kernel_params = (self._rule, self.alpha,
+                                   float(np.rint(self.beta / self.llr_step)),
+                                   self._llr_max)
+        self._buffer = np.empty(0, dtype=self.dtype)
+
+    @property
+    def edges(self):
+        """Edge indices (row_ptr, edge_var, col_ptr, col_edges) of H."""
+        return self.row_ptr, self.edge_var, self.col_ptr, self.col_edges
+
+    def configure(self, **kwargs):
+        """Return a copy of the decoder with other solver settings.
+
+        kwargs can be algorithm, alpha, beta, schedule, n_threads, dtype,
+        llr_bits or llr_step. The edge indices are shared with this
+        decoder, but not the message buffers, so the copy can be used from
+        another thread.
+        """
+        settings = ("algorithm", "alpha", "beta", "schedule", "n_threads",
+                    "dtype", "llr_bits", "llr_step")
+        for key in kwargs:
+            if key not in settings:
+                raise TypeError("configure() got an unexpected keyword "
+                                "argument %r" % key)
+        decoder = copy.copy(self)
+        decoder.__dict__.update(kwargs)
+        decoder._setup()
+        return decoder
+
+    def quantize(self, Lc):
+        """Convert LLR to the precision of the decoder messages."""
+        if self.dtype == np.int8:
+            q = np.rint(np.asarray(Lc) / self.llr_step)
+            return np.clip(q, -self._llr_max, self._llr_max).astype(np.int8)
+        return np.asarray(Lc, dtype=self.dtype)
+
+    def _dequantize(self, L):
+        """Convert a posteriori LLR of the kernels to float LLR."""
+        if self.dtype == np.int8:
+            # float32 scale and product, int32 * float32 is float64 in numpy
+            return np.multiply(L, np.float32(self.llr_step), dtype=np.float32)
+        return L
+
+    def _messages(self, n_messages):
+        """Return zeroed Lq and Lr arrays backed by the reused buffer."""
+        size = self.n_edges * n_messages
+        if self._buffer.size < 2 * size:
+            self._buffer = np.empty(2 * size, dtype=self.dtype)
+        buf = self._buffer[:2 * size]
+        buf[:] = 0
+        Lq = buf[:size].reshape(self.n_edges, n_messages)
+        Lr = buf[size:].reshape(self.n_edges, n_messages)
+        return Lq, Lr
+
+    def init_llr(self, y, snr):
+        """Return the channel LLR of BPSK symbols received over AWGN.
+
+        Parameters
+        ----------
+        y: array (n_code, n_messages) or (n_code,). Received message(s).
+        snr: float or array (n_messages,). Signal-Noise Ratio. SNR =
+            10log(1 / variance) in decibels, one per message if an array.
+            If None, y is returned as 2D array unscaled.
+
+        Returns
+        -------
+        Lc: array (n_code, n_messages). Channel LLR.
+
+        """
+        y = np.asarray(y, dtype=float)
+        if y.ndim == 1:
+            y = y[:, None]
+        if snr is None:
+            return y
+        var = 10 ** (-snr / 10)
+        return y * (2 / var)
+
+    def decode_llr(self, Lc, La=None, maxiter=10, return_iterations=False,
+                   return_converged=False):
+        """Decode codewords from their LLR.
+
+        Decoding is performed in parallel if multiple codewords are passed
+        in Lc. Each codeword stops as soon as it satisfies the parity checks.
+
+        Parameters
+        ----------
+        Lc: array (n_code, n_messages). Channel LLR of codewords.
+        La: array (n_messages, k), default None. A priori LLR added to the
+            first k bits of each codeword.
+        maxiter: int. Maximum number of iterations of the BP algorithm, at
+            least 1.
+        return_iterations: boolean, default False. If True, also return the
+            number of iterations used by each codeword.
+        return_converged: boolean, default False. If True, also return
+            whether each codeword satisfies the parity checks.
+
+        Returns
+        -------
+        L_posteriori: array (n_code, n_messages). A posteriori LLR, float32
+            unless dtype is float64.
+        n_iters: array (n_messages,) number of iterations of each codeword,
+            only if `return_iterations` is True.
+        converged: array (n_messages,) of booleans, only if
+            `return_converged` is True.
+
+        """
+        if maxiter < 1:
+            raise ValueError("maxiter must be at least 1, got %r." % maxiter)
+        # one copy, in the precision of the messages (float32 before the
+        # fixed-point quantization)
+        Lc = np.array(Lc, dtype=np.float32 if self.dtype == np.int8
+                      else self.dtype)
+        if Lc.ndim == 1:
+            Lc = Lc[:, None]
+
+        if La is not None:
+            k = La.shape[1]
+            Lc[:k, :] += np.asarray(La).T
+
+        Lc = self.quantize(Lc)
+        n_messages = Lc.shape[1]
+        with instrument.timer("decoder.decode_llr", codewords=n_messages):
+            if n_messages <= _BLOCK_MESSAGES:
+                with _numba_threads(self.n_threads):
+                    L_posteriori, n_iters, converged = self._bp_decode(
+                        Lc, maxiter)
+            else:
+                # large batches are decoded in blocks of codewords whose
+                # messages stay in cache
+                L_posteriori = np.empty(Lc.shape, dtype=np.result_type(
+                    Lc, np.float32))
+                n_iters = np.empty(n_messages, dtype=int)
+                converged = np.empty(n_messages, dtype=bool)
+                with _numba_threads(self.n_threads):
+                    for start in range(0, n_messages, _BLOCK_MESSAGES):
+                        block = slice(start, start + _BLOCK_MESSAGES)
+                        (L_posteriori[:, block], n_iters[block],
+                         converged[block]) = self._bp_decode(Lc[:, block],
+                                                             maxiter)
+        if instrument.active() is not None:
+            iterations = int(n_iters.sum())
+            instrument.count("decoder.calls")
+            instrument.count("decoder.codewords", n_messages)
+            instrument.count("decoder.iterations", iterations)
+            # messages of every edge are updated once per iteration
+            instrument.count("decoder.edges", iterations * self.n_edges)
+            instrument.count("decoder.converged", int(converged.sum()))
+
+        out = (L_posteriori,)
+        if return_iterations:
+            out += (n_iters,)
+        if return_converged:
+            out += (converged,)
+        return out if len(out) > 1 else L_posteriori
+
+    def decode(self, y, snr, maxiter=1000, return_iterations=False):
+        """Decode Gaussian noise corrupted codewords, see `decode`."""
+        squeeze = np.ndim(y) == 1
+        L_posteriori, n_iters, converged = self.decode_llr(
+            self.init_llr(y, snr), maxiter=maxiter, return_iterations=True,
+            return_converged=True)
+        x = np.array(L_posteriori <= 0).astype(int)
+        if not converged.all():
+            warnings.warn("""Decoding stopped before convergence. You may want
+                           to increase maxiter""")
+        if squeeze:
+            x = x[:, 0]
+        if return_iterations:
+            return x, n_iters
+        return x
+
+    def _bp_decode(self, Lc, maxiter):
+        """Run BP with per-codeword early termination.
+
+        The solver checks the syndrome of every codeword still being decoded
+        at the end of each iteration, from the hard decisions of the bits.
+        Converged codewords have their a posteriori LLR frozen and are
+        dropped from the working arrays, so that the cost of an iteration
+        falls as the batch converges.
+        """
+        _, n_messages = Lc.shape
+        Lq, Lr = self._messages(n_messages)
+
+        L_out = np.empty(Lc.shape, dtype=np.result_type(Lc, np.float32))
+        n_iters = np.full(n_messages, maxiter)
+        converged = np.zeros(n_messages, dtype=bool)
+        active = np.arange(n_messages)
+        for n_iter in range(maxiter):
+            Lq, Lr, L_posteriori, done = self.solver(
+                self.row_ptr, self.edge_var, self.col_ptr, self.col_edges,
+                Lc, Lq, Lr, n_iter, *self._kernel_params)
+            n_iters[active[done]] = n_iter + 1
+            converged[active[done]] = True
+            if n_iter == maxiter - 1 or done.all():
+                L_out[:, active] = self._dequantize(L_posteriori)
+                break
+            if done.any():
+                L_out[:, active[done]] = self._dequantize(
+                    L_posteriori[:, done])
+                keep = ~done
+                active = active[keep]
+                Lc = Lc[:, keep]
+                Lq = Lq[:, keep]
+                Lr = Lr[:, keep]
+        return L_out, n_iters, converged
+
+
+def decode(H, y, snr, maxiter=1000, return_iterations=False,
+           algorithm="sum-product", alpha=0.8, beta=0.5, schedule="flooding",
+           n_threads=None):
     """Decode a Gaussian noise corrupted n bits message using BP algorithm.
 
     Decoding is performed in parallel if multiple codewords are passed in y.
+    Each codeword stops as soon as it satisfies the parity checks.
 
     Parameters
     ----------
@@ -74,232 +474,582 @@ def decode(H, y, snr, maxiter=1000):
     y: array (n_code, n_messages) or (n_code,). Received message(s) in the
         codeword space.
     maxiter: int. Maximum number of iterations of the BP algorithm.
+    return_iterations: boolean, default False. If True, also return the
+        number of iterations used by each codeword.
+    algorithm, alpha, beta, schedule, n_threads: see `LDPCDecoder`.
 
     Returns
     -------
     x: array (n_code,) or (n_code, n_messages) the solutions in the
         codeword space.
+    n_iters: array (n_messages,) number of iterations of each codeword,
+        only if `return_iterations` is True.
 
     """
-    m, n = H.shape
+    decoder = LDPCDecoder(H, algorithm=algorithm, alpha=alpha, beta=beta,
+                          schedule=schedule, n_threads=n_threads)
+    return decoder.decode(y, snr, maxiter=maxiter,
+                          return_iterations=return_iterations)
 
-    bits_hist, bits_values, nodes_hist, nodes_values = utils._bitsandnodes(H)
 
-    _n_bits = np.unique(H.sum(0))
-    _n_nodes = np.unique(H.sum(1))
+def decoder_init(H, y, snr, decoder=None):
+    """Compute channel LLR and the parameters of `decode_LLR`.
 
-    if _n_bits * _n_nodes == 1:
-        solver = _logbp_numba_regular
-        bits_values = bits_values.reshape(n, -1)
-        nodes_values = nodes_values.reshape(m, -1)
+    Parameters
+    ----------
+    H: array (n_equations, n_code). Decoding matrix H.
+    y: array (n_code, n_messages) or (n_code,). Received message(s).
+    snr: float or array (n_messages,). Signal-Noise Ratio in decibels, or
+        None if y already holds LLR.
+    decoder: LDPCDecoder, default None. Decoder of H to reuse; if None, one
+        is built.
 
-    else:
-        solver = _logbp_numba
+    Returns
+    -------
+    Lc: array (n_code, n_messages). Channel LLR.
+    dec_para: dict of keyword arguments of `decode_LLR`.
 
-    var = 10 ** (-snr / 10)
+    """
+    if decoder is None:
+        decoder = LDPCDecoder(H)
+    return decoder.init_llr(y, snr), {"H": H, "decoder": decoder}
 
-    if y.ndim == 1:
-        y = y[:, None]
-    # step 0: initialization
 
-    Lc = 2 * y / var
-    _, n_messages = y.shape
+def decode_LLR(Lc, H, decoder=None, La=None, maxiter=10,
+               return_iterations=False, **kwargs):
+    """Decode a Gaussian noise corrupted n bits message using BP algorithm.
 
-    Lq = np.zeros(shape=(m, n, n_messages))
+    Decoding is performed in parallel if multiple codewords are passed in Lc.
+    Each codeword stops as soon as it satisfies the parity checks.
 
-    Lr = np.zeros(shape=(m, n, n_messages))
-    for n_iter in range(maxiter):
-        Lq, Lr, L_posteriori = solver(bits_hist, bits_values, nodes_hist,
-                                      nodes_values, Lc, Lq, Lr, n_iter)
-        x = np.array(L_posteriori <= 0).astype(int)
-        product = utils.incode(H, x)
-        if product:
-            break
-    if n_iter == maxiter - 1:
-        warnings.warn("""Decoding stopped before convergence. You may want
-                       to increase maxiter""")
-    return x.squeeze()
+    Parameters
+    ----------
+    Lc: array (n_code, n_messages). Channel LLR of codewords.
+    H: array (n_equations, n_code). Decoding matrix H.
+    decoder: LDPCDecoder, default None. Decoder of H, as returned by
+        `decoder_init`; if None, one is built.
+    La: array (n_messages, k), default None. A priori LLR added to the first
+        k bits of each codeword.
+    maxiter: int. Maximum number of iterations of the BP algorithm.
+    return_iterations: boolean, default False. If True, also return the
+        number of iterations used by each codeword.
+    kwargs: algorithm, alpha, beta, schedule or n_threads, overriding the
+        settings of `decoder` (see `LDPCDecoder`).
 
+    Returns
+    -------
+    L_posteriori: array (n_code, n_messages). A posteriori LLR.
+    n_iters: array (n_messages,) number of iterations of each codeword,
+        only if `return_iterations` is True.
 
-def decoder_init(H, y, snr):
-    bits_hist, bits_values, nodes_hist, nodes_values = utils._bitsandnodes(H)
+    """
+    if decoder is None:
+        decoder = LDPCDecoder(H, **kwargs)
+    elif kwargs:
+        decoder = decoder.configure(**kwargs)
+    return decoder.decode_llr(Lc, La=La, maxiter=maxiter,
+                              return_iterations=return_iterations)
+
+
+output_type_log2 = types.Tuple((float64[:, :], float64[:, :],
+                                float64[:, :], boolean[:]))
+
+# work chunks of the parallel solvers, each with its own scratch buffers
+_N_CHUNKS = 256
+
+solver_signature = output_type_log2(int64[:], int64[:], int64[:], int64[:],
+                                    float64[:, :], float64[:, :],
+                                    float64[:, :], int64, int64, float64,
+                                    float64)
+
+solver_signature_float32 = types.Tuple((float32[:, :], float32[:, :],
+                                        float32[:, :], boolean[:]))(
+    int64[:], int64[:], int64[:], int64[:], float32[:, :], float32[:, :],
+    float32[:, :], int64, int64, float64, float64)
+
+# the float kernels are compiled for both precisions
+solver_signatures = [solver_signature, solver_signature_float32]
+
+# fixed-point kernels: int8 LLR and messages, int32 a posteriori LLR, and
+# the saturation level of the messages as last argument
+solver_signature_fixed = types.Tuple((int8[:, :], int8[:, :], int32[:, :],
+                                      boolean[:]))(
+    int64[:], int64[:], int64[:], int64[:], int8[:, :], int8[:, :],
+    int8[:, :], int64, int64, float64, float64, int64)
+
+
+@njit(cache=True)
+def _sum_product_row(start, end, T, X, Lr, ll0, ll1):
+    """Check-node update of one row with the exact tanh rule."""
+    for e in range(start, end):
+        X[ll0:ll1] = 1.
+        for kk in range(start, end):
+            if kk != e:
+                for ll in range(ll0, ll1):
+                    X[ll] *= T[kk - start, ll]
+        for ll in range(ll0, ll1):  # arctanh
+            num = 1 + X[ll]
+            denom = 1 - X[ll]
+            if num == 0:
+                Lr[e, ll] = -1
+            elif denom == 0:
+                Lr[e, ll] = 1
+            else:
+                Lr[e, ll] = np.log(num / denom)
 
-    _n_bits = np.unique(H.sum(0))
-    _n_nodes = np.unique(H.sum(1))
 
-    if _n_bits * _n_nodes == 1:
-        solver = _logbp_numba_regular
-        bits_values = bits_values.reshape(n, -1)
-        nodes_values = nodes_values.reshape(m, -1)
+@njit(cache=True)
+def _min_sum_row(start, end, T, min1, min2, argmin1, sign, Lr, rule, alpha,
+                 beta, ll0, ll1):
+    """Check-node update of one row with a min-sum rule.
 
+    T holds the incoming messages of the row. rule is 1 for min-sum, 2 for
+    normalized min-sum (scaled by alpha) and 3 for offset min-sum (reduced
+    by beta).
+    """
+    min1[ll0:ll1] = np.inf
+    min2[ll0:ll1] = np.inf
+    sign[ll0:ll1] = 1.
+    for e in range(start, end):
+        for ll in range(ll0, ll1):
+            v = T[e - start, ll]
+            if v < 0:
+                sign[ll] = -sign[ll]
+                v = -v
+            if v < min1[ll]:
+                min2[ll] = min1[ll]
+                min1[ll] = v
+                argmin1[ll] = e
+            elif v < min2[ll]:
+                min2[ll] = v
+    for e in range(start, end):
+        for ll in range(ll0, ll1):
+            if argmin1[ll] == e:
+                mag = min2[ll]
+            else:
+                mag = min1[ll]
+            if rule == 2:
+                mag *= alpha
+            elif rule == 3:
+                mag = max(mag - beta, 0.)
+            if T[e - start, ll] < 0:
+                Lr[e, ll] = -sign[ll] * mag
+            else:
+                Lr[e, ll] = sign[ll] * mag
+
+
+@njit(cache=True)
+def _check_row(start, end, T, X, min1, min2, argmin1, Lr, rule, alpha, beta,
+               ll0, ll1):
+    """Update the check-to-bit messages Lr of one row from T (in place)."""
+    if rule == 0:
+        for e in range(start, end):
+            for ll in range(ll0, ll1):
+                T[e - start, ll] = np.tanh(0.5 * T[e - start, ll])
+        _sum_product_row(start, end, T, X, Lr, ll0, ll1)
     else:
-        solver = _logbp_numba
+        _min_sum_row(start, end, T, min1, min2, argmin1, X, Lr, rule, alpha,
+                     beta, ll0, ll1)
+
+
+@njit(cache=True)
+def _flooding_row(i, row_ptr, edge_var, Lc, Lq, Lr, n_iter, T, X, min1, min2,
+                  argmin1, rule, alpha, beta):
+    """Horizontal step of flooding BP for check row i."""
+    n_messages = Lr.shape[1]
+    start = row_ptr[i]
+    end = row_ptr[i + 1]
+    for e in range(start, end):
+        for ll in range(n_messages):
+            if n_iter == 0:
+                T[e - start, ll] = Lc[edge_var[e], ll]
+            else:
+                T[e - start, ll] = Lq[e, ll]
+    _check_row(start, end, T, X, min1, min2, argmin1, Lr, rule, alpha, beta,
+               0, n_messages)
+
+
+@njit(cache=True)
+def _flooding_column(j, col_ptr, col_edges, Lc, Lq, Lr):
+    """Vertical step of flooding BP for bit j."""
+    n_messages = Lr.shape[1]
+    start = col_ptr[j]
+    end = col_ptr[j + 1]
+    for kk in range(start, end):
+        e = col_edges[kk]
+        for ll in range(n_messages):
+            Lq[e, ll] = Lc[j, ll]
+        for kk2 in range(start, end):
+            if kk2 != kk:
+                e2 = col_edges[kk2]
+                for ll in range(n_messages):
+                    Lq[e, ll] += Lr[e2, ll]
+
+
+@njit(cache=True)
+def _posteriori_column(j, col_ptr, col_edges, Lc, Lr, L_posteriori):
+    """LLR a posteriori of bit j."""
+    for ll in range(Lr.shape[1]):
+        acc = 0.
+        for kk in range(col_ptr[j], col_ptr[j + 1]):
+            acc += Lr[col_edges[kk], ll]
+        L_posteriori[j, ll] = Lc[j, ll] + acc
+
+
+@njit(cache=True)
+def _layered_row(i, row_ptr, edge_var, Lq, Lr, L_posteriori, T, X, min1,
+                 min2, argmin1, rule, alpha, beta, ll0, ll1):
+    """Update check row i and the a posteriori LLR of its bits."""
+    start = row_ptr[i]
+    end = row_ptr[i + 1]
+    for e in range(start, end):
+        j = edge_var[e]
+        for ll in range(ll0, ll1):
+            Lq[e, ll] = L_posteriori[j, ll] - Lr[e, ll]
+            T[e - start, ll] = Lq[e, ll]
+    _check_row(start, end, T, X, min1, min2, argmin1, Lr, rule, alpha, beta,
+               ll0, ll1)
+    for e in range(start, end):
+        j = edge_var[e]
+        for ll in range(ll0, ll1):
+            L_posteriori[j, ll] = Lq[e, ll] + Lr[e, ll]
+
+
+@njit(cache=True)
+def _syndrome_rows(i0, i1, row_ptr, edge_var, L_posteriori, satisfied,
+                   parity):
+    """Clear `satisfied` for the codewords failing one of the checks i0..i1.
+
+    The hard decision of a bit is L_posteriori <= 0. Stops early once no
+    codeword is left satisfied.
+    """
+    n_messages = satisfied.shape[0]
+    n_satisfied = 0
+    for ll in range(n_messages):
+        if satisfied[ll]:
+            n_satisfied += 1
+    for i in range(i0, i1):
+        if n_satisfied == 0:
+            return
+        parity[:] = False
+        for e in range(row_ptr[i], row_ptr[i + 1]):
+            j = edge_var[e]
+            for ll in range(n_messages):
+                if L_posteriori[j, ll] <= 0:
+                    parity[ll] = not parity[ll]
+        for ll in range(n_messages):
+            if parity[ll] and satisfied[ll]:
+                satisfied[ll] = False
+                n_satisfied -= 1
+
+
+@njit(cache=True)
+def _max_row_degree(row_ptr):
+    max_degree = 0
+    for i in range(row_ptr.shape[0] - 1):
+        max_degree = max(max_degree, row_ptr[i + 1] - row_ptr[i])
+    return max_degree
+
+
+@njit(solver_signatures, nogil=True, cache=True)
+def _logbp_numba(row_ptr, edge_var, col_ptr, col_edges, Lc, Lq, Lr, n_iter,
+                 rule, alpha, beta):
+    """Perform inner ext LogBP solver on per-edge messages.
+
+    Lq and Lr are (n_edges, n_messages) arrays indexed by the edge ids of
+    `utils._edges`, so memory scales with the number of nonzeros of H.
+    rule selects the check-node update, see `ALGORITHMS`.
+    """
+    n_edges, n_messages = Lr.shape
+    m = row_ptr.shape[0] - 1
+    n = col_ptr.shape[0] - 1
 
-    if y.ndim == 1:
-        y = y[:, None]
-    # step 0: initialization
+    T = np.empty((_max_row_degree(row_ptr), n_messages), dtype=Lr.dtype)
+    X = np.empty(n_messages, dtype=Lr.dtype)
+    min1 = np.empty(n_messages, dtype=Lr.dtype)
+    min2 = np.empty(n_messages, dtype=Lr.dtype)
+    argmin1 = np.empty(n_messages, dtype=np.int64)
 
-    if snr is not None:
-        var = 10 ** (-snr / 10)
-        y *= 2 / var
+    # step 1 : Horizontal
+    for i in range(m):
+        _flooding_row(i, row_ptr, edge_var, Lc, Lq, Lr, n_iter, T, X, min1,
+                      min2, argmin1, rule, alpha, beta)
 
-    return y, {"H": H, "solver": solver, "bits_values": bits_values, "nodes_values": nodes_values,
-               "nodes_hist": nodes_hist, "bits_hist": bits_hist}
+    # step 2 : Vertical
+    for j in range(n):
+        _flooding_column(j, col_ptr, col_edges, Lc, Lq, Lr)
 
+    # LLR a posteriori:
+    L_posteriori = np.zeros((n, n_messages), dtype=Lc.dtype)
+    for j in range(n):
+        _posteriori_column(j, col_ptr, col_edges, Lc, Lr, L_posteriori)
 
-def decode_LLR(Lc, H, solver, bits_values, nodes_values, nodes_hist, bits_hist, La=None, maxiter=10):
-    """Decode a Gaussian noise corrupted n bits message using BP algorithm.
+    satisfied = np.ones(n_messages, dtype=np.bool_)
+    _syndrome_rows(0, m, row_ptr, edge_var, L_posteriori, satisfied,
+                   np.empty(n_messages, dtype=np.bool_))
 
-    Decoding is performed in parallel if multiple codewords are passed in y.
+    return Lq, Lr, L_posteriori, satisfied
 
-    Parameters
-    ----------
-    H: array (n_equations, n_code). Decoding matrix H.
-    Lc: a priori LLR of codewords.
-    maxiter: int. Maximum number of iterations of the BP algorithm.
 
+@njit(solver_signatures, parallel=True, nogil=True, cache=True)
+def _logbp_numba_parallel(row_ptr, edge_var, col_ptr, col_edges, Lc, Lq, Lr,
+                          n_iter, rule, alpha, beta):
+    """Multi-threaded `_logbp_numba`.
+
+    Check rows are split in chunks distributed over the threads for the
+    horizontal step, and so are bits for the vertical step. Every edge is
+    written by a single row and a single bit, so no synchronization is
+    needed and the results are identical to the serial solver.
     """
+    n_edges, n_messages = Lr.shape
+    m = row_ptr.shape[0] - 1
+    n = col_ptr.shape[0] - 1
+    max_degree = _max_row_degree(row_ptr)
+    n_chunks = max(1, min(_N_CHUNKS, m))
 
-    m, n = H.shape
+    # step 1 : Horizontal
+    for c in prange(n_chunks):
+        T = np.empty((max_degree, n_messages), dtype=Lr.dtype)
+        X = np.empty(n_messages, dtype=Lr.dtype)
+        min1 = np.empty(n_messages, dtype=Lr.dtype)
+        min2 = np.empty(n_messages, dtype=Lr.dtype)
+        argmin1 = np.empty(n_messages, dtype=np.int64)
+        for i in range(c * m // n_chunks, (c + 1) * m // n_chunks):
+            _flooding_row(i, row_ptr, edge_var, Lc, Lq, Lr, n_iter, T, X,
+                          min1, min2, argmin1, rule, alpha, beta)
 
-    if La is not None:
-        k = La.shape[1]
-        # print(Lc.shape,La.shape)
-        Lc[:k, :] = np.add(Lc[:k, :], np.array(La).T)
-        # print(Lc.shape)
+    # step 2 : Vertical
+    for j in prange(n):
+        _flooding_column(j, col_ptr, col_edges, Lc, Lq, Lr)
 
-    _, n_messages = Lc.shape
+    # LLR a posteriori:
+    L_posteriori = np.zeros((n, n_messages), dtype=Lc.dtype)
+    for j in prange(n):
+        _posteriori_column(j, col_ptr, col_edges, Lc, Lr, L_posteriori)
+
+    satisfied_chunks = np.ones((n_chunks, n_messages), dtype=np.bool_)
+    for c in prange(n_chunks):
+        _syndrome_rows(c * m // n_chunks, (c + 1) * m // n_chunks, row_ptr,
+                       edge_var, L_posteriori, satisfied_chunks[c],
+                       np.empty(n_messages, dtype=np.bool_))
+    satisfied = np.ones(n_messages, dtype=np.bool_)
+    for c in range(n_chunks):
+        for ll in range(n_messages):
+            satisfied[ll] &= satisfied_chunks[c, ll]
+
+    return Lq, Lr, L_posteriori, satisfied
+
+
+@njit(solver_signatures, nogil=True, cache=True)
+def _logbp_numba_layered(row_ptr, edge_var, col_ptr, col_edges, Lc, Lq, Lr,
+                         n_iter, rule, alpha, beta):
+    """Perform one iteration of layered (row-serial) LogBP.
+
+    Check rows are processed one after the other and the a posteriori LLR of
+    their bits is updated right away, so later rows of the same iteration
+    already use the new messages. Uses the same edge indices and message
+    arrays as `_logbp_numba`; Lq holds the last bit-to-check messages.
+    """
+    n_edges, n_messages = Lr.shape
+    m = row_ptr.shape[0] - 1
+    n = col_ptr.shape[0] - 1
+
+    T = np.empty((_max_row_degree(row_ptr), n_messages), dtype=Lr.dtype)
+    X = np.empty(n_messages, dtype=Lr.dtype)
+    min1 = np.empty(n_messages, dtype=Lr.dtype)
+    min2 = np.empty(n_messages, dtype=Lr.dtype)
+    argmin1 = np.empty(n_messages, dtype=np.int64)
+
+    # LLR a posteriori at the end of the previous iteration:
+    L_posteriori = np.zeros((n, n_messages), dtype=Lc.dtype)
+    for j in range(n):
+        _posteriori_column(j, col_ptr, col_edges, Lc, Lr, L_posteriori)
 
-    Lq = np.zeros(shape=(m, n, n_messages))
+    for i in range(m):
+        _layered_row(i, row_ptr, edge_var, Lq, Lr, L_posteriori, T, X, min1,
+                     min2, argmin1, rule, alpha, beta, 0, n_messages)
 
-    Lr = np.zeros(shape=(m, n, n_messages))
-    for n_iter in range(maxiter):
-        Lq, Lr, L_posteriori = solver(bits_hist, bits_values, nodes_hist,
-                                      nodes_values, Lc, Lq, Lr, n_iter)
-        x = np.array(L_posteriori <= 0).astype(int)
-        product = utils.incode(H, x)
-        if product:
-            break
-    return L_posteriori
+    satisfied = np.ones(n_messages, dtype=np.bool_)
+    _syndrome_rows(0, m, row_ptr, edge_var, L_posteriori, satisfied,
+                   np.empty(n_messages, dtype=np.bool_))
 
+    return Lq, Lr, L_posteriori, satisfied
 
-output_type_log2 = types.Tuple((float64[:, :, :], float64[:, :, :],
-                                float64[:, :]))
 
+@njit(solver_signatures, parallel=True, nogil=True, cache=True)
+def _logbp_numba_layered_parallel(row_ptr, edge_var, col_ptr, col_edges, Lc,
+                                  Lq, Lr, n_iter, rule, alpha, beta):
+    """Multi-threaded `_logbp_numba_layered`.
 
-@njit(output_type_log2(int64[:], int64[:], int64[:], int64[:], float64[:, :],
-                       float64[:, :, :], float64[:, :, :], int64), cache=True)
-def _logbp_numba(bits_hist, bits_values, nodes_hist, nodes_values, Lc, Lq, Lr,
-                 n_iter):
-    """Perform inner ext LogBP solver."""
-    m, n, n_messages = Lr.shape
-    # step 1 : Horizontal
+    Rows must be processed in order, so the codewords (message axis) are
+    split in chunks distributed over the threads instead.
+    """
+    n_edges, n_messages = Lr.shape
+    m = row_ptr.shape[0] - 1
+    n = col_ptr.shape[0] - 1
+    max_degree = _max_row_degree(row_ptr)
+    n_chunks = max(1, min(_N_CHUNKS, n_messages))
+
+    # LLR a posteriori at the end of the previous iteration:
+    L_posteriori = np.zeros((n, n_messages), dtype=Lc.dtype)
+    for j in prange(n):
+        _posteriori_column(j, col_ptr, col_edges, Lc, Lr, L_posteriori)
+
+    satisfied = np.ones(n_messages, dtype=np.bool_)
+    for c in prange(n_chunks):
+        ll0 = c * n_messages // n_chunks
+        ll1 = (c + 1) * n_messages // n_chunks
+        width = ll1 - ll0
+        Lq_c = Lq[:, ll0:ll1]
+        Lr_c = Lr[:, ll0:ll1]
+        L_c = L_posteriori[:, ll0:ll1]
+        T = np.empty((max_degree, width), dtype=Lr.dtype)
+        X = np.empty(width, dtype=Lr.dtype)
+        min1 = np.empty(width, dtype=Lr.dtype)
+        min2 = np.empty(width, dtype=Lr.dtype)
+        argmin1 = np.empty(width, dtype=np.int64)
+        for i in range(m):
+            _layered_row(i, row_ptr, edge_var, Lq_c, Lr_c, L_c, T, X, min1,
+                         min2, argmin1, rule, alpha, beta, 0, width)
+        _syndrome_rows(0, m, row_ptr, edge_var, L_c, satisfied[ll0:ll1],
+                       np.empty(width, dtype=np.bool_))
+
+    return Lq, Lr, L_posteriori, satisfied
+
+
+@njit(cache=True)
+def _saturate(v, llr_max):
+    if v > llr_max:
+        return llr_max
+    if v < -llr_max:
+        return -llr_max
+    return v
+
+
+@njit(cache=True)
+def _flooding_column_fixed(j, col_ptr, col_edges, Lc, Lq, Lr, llr_max):
+    """Vertical step of fixed-point flooding BP for bit j."""
+    n_messages = Lr.shape[1]
+    start = col_ptr[j]
+    end = col_ptr[j + 1]
+    for ll in range(n_messages):
+        acc = np.int32(Lc[j, ll])
+        for kk in range(start, end):
+            acc += Lr[col_edges[kk], ll]
+        for kk in range(start, end):
+            e = col_edges[kk]
+            Lq[e, ll] = _saturate(acc - Lr[e, ll], llr_max)
+
+
+@njit(cache=True)
+def _layered_row_fixed(i, row_ptr, edge_var, Lq, Lr, L_posteriori, T, X,
+                       min1, min2, argmin1, rule, alpha, beta, llr_max):
+    """Fixed-point `_layered_row`: bit-to-check messages are saturated."""
+    n_messages = Lr.shape[1]
+    start = row_ptr[i]
+    end = row_ptr[i + 1]
+    for e in range(start, end):
+        j = edge_var[e]
+        for ll in range(n_messages):
+            Lq[e, ll] = _saturate(L_posteriori[j, ll] - Lr[e, ll], llr_max)
+            T[e - start, ll] = Lq[e, ll]
+    _check_row(start, end, T, X, min1, min2, argmin1, Lr, rule, alpha, beta,
+               0, n_messages)
+    for e in range(start, end):
+        j = edge_var[e]
+        for ll in range(n_messages):
+            L_posteriori[j, ll] = np.int32(Lq[e, ll]) + Lr[e, ll]
+
+
+@njit(solver_signature_fixed, nogil=True, cache=True)
+def _logbp_fixed(row_ptr, edge_var, col_ptr, col_edges, Lc, Lq, Lr, n_iter,
+                 rule, alpha, beta, llr_max):
+    """Fixed-point `_logbp_numba` for the min-sum rules.
+
+    Lc, Lq and Lr hold LLR quantized to integers; messages saturate at
+    +/- llr_max and the a posteriori LLR are accumulated in int32. The
+    normalized min-sum magnitudes are rounded down and beta is given in
+    units of the quantized LLR.
+    """
+    n_edges, n_messages = Lr.shape
+    m = row_ptr.shape[0] - 1
+    n = col_ptr.shape[0] - 1
+
+    T = np.empty((_max_row_degree(row_ptr), n_messages))
+    X = np.empty(n_messages)
+    min1 = np.empty(n_messages)
+    min2 = np.empty(n_messages)
+    argmin1 = np.empty(n_messages, dtype=np.int64)
 
-    bits_counter = 0
-    nodes_counter = 0
     for i in range(m):
-        # ni = bits[i]
-        ff = bits_hist[i]
-        ni = bits_values[bits_counter: bits_counter + ff]
-        bits_counter += ff
-        for j in ni:
-            nij = ni[:]
-
-            X = np.ones(n_messages)
-            if n_iter == 0:
-                for kk in range(len(nij)):
-                    if nij[kk] != j:
-                        X *= np.tanh(0.5 * Lc[nij[kk]])
-            else:
-                for kk in range(len(nij)):
-                    if nij[kk] != j:
-                        X *= np.tanh(0.5 * Lq[i, nij[kk]])
-            num = 1 + X
-            denom = 1 - X
-            for ll in range(n_messages):
-                if num[ll] == 0:
-                    Lr[i, j, ll] = -1
-                elif denom[ll] == 0:
-                    Lr[i, j, ll] = 1
-                else:
-                    Lr[i, j, ll] = np.log(num[ll] / denom[ll])
+        _flooding_row(i, row_ptr, edge_var, Lc, Lq, Lr, n_iter, T, X, min1,
+                      min2, argmin1, rule, alpha, beta)
 
-    # step 2 : Vertical
     for j in range(n):
-        # mj = nodes[j]
-        ff = nodes_hist[j]
-        mj = nodes_values[nodes_counter: nodes_counter + ff]
-        nodes_counter += ff
-        for i in mj:
-            mji = mj[:]
-            Lq[i, j] = Lc[j]
-
-            for kk in range(len(mji)):
-                if mji[kk] != i:
-                    Lq[i, j] += Lr[mji[kk], j]
+        _flooding_column_fixed(j, col_ptr, col_edges, Lc, Lq, Lr, llr_max)
 
-    # LLR a posteriori:
-    L_posteriori = np.zeros((n, n_messages))
-    nodes_counter = 0
+    L_posteriori = np.zeros((n, n_messages), dtype=np.int32)
     for j in range(n):
-        ff = nodes_hist[j]
-        mj = nodes_values[nodes_counter: nodes_counter + ff]
-        nodes_counter += ff
-        L_posteriori[j] = Lc[j] + Lr[mj, j].sum(axis=0)
+        _posteriori_column(j, col_ptr, col_edges, Lc, Lr, L_posteriori)
 
-    return Lq, Lr, L_posteriori
+    satisfied = np.ones(n_messages, dtype=np.bool_)
+    _syndrome_rows(0, m, row_ptr, edge_var, L_posteriori, satisfied,
+                   np.empty(n_messages, dtype=np.bool_))
 
+    return Lq, Lr, L_posteriori, satisfied
 
-@njit(output_type_log2(int64[:], int64[:, :], int64[:], int64[:, :],
-                       float64[:, :], float64[:, :, :], float64[:, :, :],
-                       int64), cache=True)
-def _logbp_numba_regular(bits_hist, bits_values, nodes_hist, nodes_values, Lc,
-                         Lq, Lr, n_iter):
-    """Perform inner ext LogBP solver."""
-    m, n, n_messages = Lr.shape
-    # step 1 : Horizontal
-    for i in range(m):
-        ni = bits_values[i]
-        for j in ni:
-            nij = ni[:]
 
-            X = np.ones(n_messages)
-            if n_iter == 0:
-                for kk in range(len(nij)):
-                    if nij[kk] != j:
-                        X *= np.tanh(0.5 * Lc[nij[kk]])
-            else:
-                for kk in range(len(nij)):
-                    if nij[kk] != j:
-                        X *= np.tanh(0.5 * Lq[i, nij[kk]])
-            num = 1 + X
-            denom = 1 - X
-            for ll in range(n_messages):  # arctanh
-                if num[ll] == 0:
-                    Lr[i, j, ll] = -1
-                elif denom[ll] == 0:
-                    Lr[i, j, ll] = 1
-                else:
-                    Lr[i, j, ll] = np.log(num[ll] / denom[ll])
+@njit(solver_signature_fixed, nogil=True, cache=True)
+def _logbp_fixed_layered(row_ptr, edge_var, col_ptr, col_edges, Lc, Lq, Lr,
+                         n_iter, rule, alpha, beta, llr_max):
+    """Fixed-point `_logbp_numba_layered` for the min-sum rules."""
+    n_edges, n_messages = Lr.shape
+    m = row_ptr.shape[0] - 1
+    n = col_ptr.shape[0] - 1
 
-    # step 2 : Vertical
+    T = np.empty((_max_row_degree(row_ptr), n_messages))
+    X = np.empty(n_messages)
+    min1 = np.empty(n_messages)
+    min2 = np.empty(n_messages)
+    argmin1 = np.empty(n_messages, dtype=np.int64)
+
+    L_posteriori = np.zeros((n, n_messages), dtype=np.int32)
     for j in range(n):
-        mj = nodes_values[j]
-        for i in mj:
-            mji = mj[:]
-            Lq[i, j] = Lc[j]
+        _posteriori_column(j, col_ptr, col_edges, Lc, Lr, L_posteriori)
 
-            for kk in range(len(mji)):
-                if mji[kk] != i:
-                    Lq[i, j] += Lr[mji[kk], j]
+    for i in range(m):
+        _layered_row_fixed(i, row_ptr, edge_var, Lq, Lr, L_posteriori, T, X,
+                           min1, min2, argmin1, rule, alpha, beta, llr_max)
+
+    satisfied = np.ones(n_messages, dtype=np.bool_)
+    _syndrome_rows(0, m, row_ptr, edge_var, L_posteriori, satisfied,
+                   np.empty(n_messages, dtype=np.bool_))
+
+    return Lq, Lr, L_posteriori, satisfied
 
-    # LLR a posteriori:
-    L_posteriori = np.zeros((n, n_messages))
-    for j in range(n):
-        mj = nodes_values[j]
-        L_posteriori[j] = Lc[j] + Lr[mj, j].sum(axis=0)
 
-    return Lq, Lr, L_posteriori
+@njit(cache=True)
+def _logaddexp(a, b):
+    m = max(a, b)
+    if m == -np.inf:
+        return m
+    return m + np.log1p(np.exp(-abs(a - b)))
+
+
+@njit(cache=True)
+def fc_numba(LLR, rho, LLR_limit=50.):
+    """In-place `fc` of a contiguous float array, callable from numba code.
+
+    rho is a scalar crossover probability.
+    """
+    log_rho = np.log(rho)
+    log_1mrho = np.log1p(-rho)
+    flat = LLR.reshape(-1)
+    for i in range(flat.shape[0]):
+        L = min(flat[i], LLR_limit)
+        flat[i] = (_logaddexp(L + log_1mrho, log_rho) -
+                   _logaddexp(log_1mrho, L + log_rho))
+    return LLR
 
 
 def get_message(tG, x):
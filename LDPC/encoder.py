@@ -1,3 +1,6 @@
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+
 from . import utils
 
 
@@ -65,6 +68,111 @@ def encode(tG, v, snr=None, seed=None):
     return y
 
 
+def is_systematic(tG):
+    """Return True if the first k rows of tG (n, k) are the identity."""
+    n, k = tG.shape
+    top = tG[:k]
+    # k nonzero entries, all on the diagonal and equal to 1
+    if issparse(top):
+        return top.nnz == k and (top.diagonal() == 1).all()
+    return (np.count_nonzero(top) == k and
+            bool((np.diagonal(top) == 1).all()))
+
+
+def stream2groups(bits, k):
+    """Pad bit stream(s) with zeros and split them into groups of k bits.
+
+    Parameters
+    ----------
+    bits: array (n_bits,) or (n_streams, n_bits). Bit stream(s).
+    k: int. Number of information bits per codeword.
+
+    Returns
+    -------
+    v: array (k, n_groups) or (k, n_streams * n_groups). Column `g` holds
+        bits `g * k` to `(g + 1) * k` of a stream; the groups of stream `b`
+        are the columns `b * n_groups` to `(b + 1) * n_groups`.
+
+    """
+    bits = np.asarray(bits)
+    if bits.ndim == 1:
+        bits = bits[None, :]
+    n_streams, n_bits = bits.shape
+    n_groups = -(-n_bits // k)
+
+    v = np.zeros((n_streams, n_groups * k), dtype=bits.dtype)
+    v[:, :n_bits] = bits
+    return v.reshape(n_streams * n_groups, k).T
+
+
+def _csr(X):
+    return X if issparse(X) and X.format == "csr" else csr_matrix(X)
+
+
+def encode_groups(tG, v, snr=None, seed=None, systematic=None):
+    """Encode many k-bits groups at once with a single GF(2) product.
+
+    Parameters
+    ----------
+    tG: array or scipy.sparse.csr_matrix (n, k). Transposed coding matrix
+    obtained from `pyldpc.make_ldpc`. A dense tG is converted to CSR on
+    every call: to encode many batches, convert it once (see
+    `get_coding_matrix`).
+    v: array (k, n_groups) binary messages, one per column.
+    snr: float. Signal-Noise Ratio. SNR = 10log(1 / variance) in decibels.
+    systematic: boolean, default None. If True, tG is assumed to be
+        systematic and only the parity part `tG[k:] v` is computed. If None,
+        this is detected from tG.
+
+    Returns
+    -------
+    y: array (n, n_groups) coded messages + noise.
+
+    """
+    n, k = tG.shape
+    v = np.asarray(v)
+
+    if systematic is None:
+        systematic = is_systematic(tG)
+
+    if systematic:
+        d = np.empty((n, v.shape[1]), dtype=v.dtype)
+        d[:k] = v
+        d[k:] = utils.binaryproduct(_csr(tG[k:]), v)
+    else:
+        d = utils.binaryproduct(_csr(tG), v)
+    y = 1 - 2 * d  # (-1) ** d
+
+    if snr is not None:
+        y = add_gaussian_noise(y, snr, seed=seed)
+
+    return y
+
+
+def encode_stream(tG, bits, snr=None, seed=None, systematic=None):
+    """Encode bit stream(s) of arbitrary length group by group.
+
+    The stream(s) are zero-padded to a multiple of k and encoded with one
+    call to `encode_groups`.
+
+    Parameters
+    ----------
+    tG: array or scipy.sparse.csr_matrix (n, k). Transposed coding matrix.
+    bits: array (n_bits,) or (n_streams, n_bits). Bit stream(s).
+    snr: float. Signal-Noise Ratio. SNR = 10log(1 / variance) in decibels.
+    systematic: boolean, default None. See `encode_groups`.
+
+    Returns
+    -------
+    y: array (n, n_groups) or (n, n_streams * n_groups). Codewords in the
+        column layout of `stream2groups`.
+
+    """
+    n, k = tG.shape
+    return encode_groups(tG, stream2groups(bits, k), snr=snr, seed=seed,
+                         systematic=systematic)
+
+
 def add_gaussian_noise(y, snr, seed=None):
     rng = utils.check_random_state(seed)
     sigma = 10 ** (- snr / 20)
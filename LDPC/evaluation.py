@@ -0,0 +1,194 @@
+"""Bit error rate and throughput evaluation of the decoders."""
+import time
+
+import numpy as np
+from numba import config
+
+from . import utils
+from .decoder import ALGORITHMS, _check_threads, decode_LLR, decoder_init
+from .encoder import encode_groups, is_systematic
+
+
+def compare_algorithms(H, tG, snrs, algorithms=None, schedules=("flooding",),
+                       n_messages=100, maxiter=50, seed=None, **kwargs):
+    """Measure BER and decoder throughput of check-node update rules.
+
+    The same noisy codewords are decoded with every algorithm and schedule,
+    so that the loss in BER of the min-sum approximations can be weighed
+    against their gain in throughput.
+
+    Parameters
+    ----------
+    H: array (n_equations, n_code). Parity-check matrix.
+    tG: array (n_code, n_bits). Systematic coding matrix.
+    snrs: list of float. Signal-Noise Ratios in decibels.
+    algorithms: list of str, default None. Check-node update rules, see
+        `decoder.ALGORITHMS`. If None, all of them are compared.
+    schedules: list of str, default ("flooding",). Message-passing
+        schedules, see `decoder.SCHEDULES`.
+    n_messages: int. Number of codewords decoded at each SNR.
+    maxiter: int. Maximum number of iterations of the BP algorithm.
+    seed: int, seed of the random generator.
+    kwargs: other arguments of `decode_LLR` (e.g. alpha, beta).
+
+    Returns
+    -------
+    results: list of dict with keys "algorithm", "schedule", "snr", "ber",
+        "fer", "mean_iterations", "codewords_per_s" and "info_bits_per_s".
+
+    """
+    if algorithms is None:
+        algorithms = list(ALGORITHMS)
+    if not is_systematic(tG):
+        raise ValueError("compare_algorithms requires a systematic tG.")
+    rng = utils.check_random_state(seed)
+    n, k = tG.shape
+
+    results = []
+    for snr in snrs:
+        v = rng.randint(2, size=(k, n_messages))
+        y = encode_groups(tG, v, snr=snr, seed=rng, systematic=True)
+        Lc, dec_para = decoder_init(H, y, snr)
+        for schedule in schedules:
+            # compile the kernels outside of the timed region
+            decode_LLR(Lc[:, :1], **dec_para, maxiter=1, schedule=schedule)
+            for algorithm in algorithms:
+                t0 = time.perf_counter()
+                L, n_iters = decode_LLR(Lc, **dec_para, maxiter=maxiter,
+                                        return_iterations=True,
+                                        algorithm=algorithm,
+                                        schedule=schedule, **kwargs)
+                elapsed = time.perf_counter() - t0
+                errors = (L[:k] <= 0) != v
+                results.append({"algorithm": algorithm, "schedule": schedule,
+                                "snr": snr, "ber": errors.mean(),
+                                "fer": errors.any(axis=0).mean(),
+                                "mean_iterations": n_iters.mean(),
+                                "codewords_per_s": n_messages / elapsed,
+                                "info_bits_per_s": n_messages * k / elapsed})
+    return results
+
+
+def thread_scaling(H, tG, snr, thread_counts=None, n_messages=256,
+                   maxiter=10, repeat=3, seed=None, **kwargs):
+    """Measure how the multi-threaded decoder scales with the core count.
+
+    Parameters
+    ----------
+    H: array (n_equations, n_code). Parity-check matrix.
+    tG: array (n_code, n_bits). Systematic coding matrix.
+    snr: float. Signal-Noise Ratio in decibels.
+    thread_counts: list of int, default None. Numbers of threads to time, at
+        most NUMBA_NUM_THREADS; if None, powers of two up to the number of
+        cores.
+    n_messages: int. Number of codewords decoded together.
+    maxiter: int. Maximum number of iterations of the BP algorithm.
+    repeat: int. The best of `repeat` runs is kept.
+    seed: int, seed of the random generator.
+    kwargs: other arguments of `decode_LLR` (e.g. algorithm, schedule).
+
+    Returns
+    -------
+    results: list of dict with keys "n_threads", "seconds",
+        "codewords_per_s", "info_bits_per_s" and "speedup" (relative to the
+        serial solver).
+
+    """
+    if thread_counts is None:
+        n_cores = config.NUMBA_NUM_THREADS
+        thread_counts = [2 ** i for i in range(n_cores.bit_length())
+                         if 2 ** i <= n_cores]
+    for n_threads in thread_counts:
+        _check_threads(n_threads)
+    rng = utils.check_random_state(seed)
+    n, k = tG.shape
+
+    v = rng.randint(2, size=(k, n_messages))
+    y = encode_groups(tG, v, snr=snr, seed=rng)
+    Lc, dec_para = decoder_init(H, y, snr)
+
+    results = []
+    serial = None
+    for n_threads in [None] + list(thread_counts):
+        decode_LLR(Lc[:, :1], **dec_para, maxiter=1, n_threads=n_threads,
+                   **kwargs)
+        elapsed = np.inf
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            decode_LLR(Lc, **dec_para, maxiter=maxiter, n_threads=n_threads,
+                       **kwargs)
+            elapsed = min(elapsed, time.perf_counter() - t0)
+        if serial is None:
+            serial = elapsed
+        results.append({"n_threads": "serial" if n_threads is None
+                        else n_threads, "seconds": elapsed,
+                        "codewords_per_s": n_messages / elapsed,
+                        "info_bits_per_s": n_messages * k / elapsed,
+                        "speedup": serial / elapsed})
+    return results
+
+
+def precision_regression(H, tG, snrs, dtypes=("float32", "int8"),
+                         algorithm="normalized-min-sum", n_messages=200,
+                         maxiter=20, rtol=0.25, atol=1e-4, seed=None,
+                         **kwargs):
+    """Check that reduced-precision decoding keeps the float64 BER.
+
+    The same noisy codewords are decoded in float64 and with every dtype of
+    `dtypes`; a dtype passes at an SNR if its BER is at most
+    `(1 + rtol) * ber_float64 + atol`.
+
+    Parameters
+    ----------
+    H: array (n_equations, n_code). Parity-check matrix.
+    tG: array (n_code, n_bits). Systematic coding matrix.
+    snrs: list of float. Signal-Noise Ratios in decibels.
+    dtypes: list of str. Precisions compared to float64, see
+        `decoder.DTYPES`.
+    algorithm: str, default "normalized-min-sum". Check-node update rule;
+        the fixed-point mode requires a min-sum rule.
+    n_messages: int. Number of codewords decoded at each SNR.
+    maxiter: int. Maximum number of iterations of the BP algorithm.
+    rtol: float. Relative BER tolerance.
+    atol: float. Absolute BER tolerance.
+    seed: int, seed of the random generator.
+    kwargs: other settings of `LDPCDecoder` (e.g. schedule, llr_bits).
+
+    Returns
+    -------
+    results: list of dict with keys "dtype", "snr", "ber", "ber_float64"
+        and "passed".
+
+    """
+    if not is_systematic(tG):
+        raise ValueError("precision_regression requires a systematic tG.")
+    rng = utils.check_random_state(seed)
+    n, k = tG.shape
+
+    results = []
+    for snr in snrs:
+        v = rng.randint(2, size=(k, n_messages))
+        y = encode_groups(tG, v, snr=snr, seed=rng, systematic=True)
+        Lc, dec_para = decoder_init(H, y, snr)
+        reference = decode_LLR(Lc, **dec_para, maxiter=maxiter,
+                               algorithm=algorithm, **kwargs)
+        ber_reference = ((reference[:k] <= 0) != v).mean()
+        for dtype in dtypes:
+            L = decode_LLR(Lc, **dec_para, maxiter=maxiter,
+                           algorithm=algorithm, dtype=dtype, **kwargs)
+            ber = ((L[:k] <= 0) != v).mean()
+            passed = ber <= (1 + rtol) * ber_reference + atol
+            results.append({"dtype": dtype, "snr": snr, "ber": ber,
+                            "ber_float64": ber_reference, "passed": passed})
+    return results
+
+
+def print_results(results):
+    """Print the rows returned by the comparison functions as a table."""
+    if not results:
+        return
+    keys = list(results[0])
+    print("  ".join("%16s" % key for key in keys))
+    for row in results:
+        print("  ".join("%16.6g" % v if isinstance(v, (float, np.floating))
+                        else "%16s" % v for v in row.values()))
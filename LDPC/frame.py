@@ -0,0 +1,116 @@
+"""Layout of a bit stream encoded as a frame of systematic codewords."""
+import sys
+
+import numpy as np
+
+
+class FrameLayout:
+    """Positions of the stream bits in a frame of systematic codewords.
+
+    A stream of n1 bits is cut in g = ceil(n1 / k) groups of k bits, the
+    last one padded with zeros, and each group is encoded in an n bits
+    systematic codeword; the codewords are concatenated into a frame of
+    g * n bits (see `encode_stream`). The frame position of stream bit b is
+    (b // k) * n + b % k. These indices are computed once, so moving LLR or
+    bits between the stream and the frame is a single gather or scatter.
+
+    Frames are indexed along their first axis and can be numpy arrays or
+    torch tensors, with trailing axes (e.g. one column per frame).
+
+    Parameters
+    ----------
+    n1: int. Number of bits of the stream.
+    n: int. Codeword length.
+    k: int. Number of information bits per codeword.
+
+    Attributes
+    ----------
+    g: int. Number of codewords of the frame.
+    info: array (n1,). Frame position of each stream bit.
+    systematic: array (g * k,). Frame positions of all information bits,
+        including the padding of the last codeword.
+
+    """
+
+    def __init__(self, n1, n, k):
+        if not 0 < k <= n:
+            raise ValueError("k must be between 1 and n.")
+        self.n1 = int(n1)
+        self.n = int(n)
+        self.k = int(k)
+        self.g = -(-self.n1 // self.k)
+        b = np.arange(self.g * self.k)
+        self.systematic = (b // self.k) * self.n + b % self.k
+        self.info = self.systematic[:self.n1]
+        self._torch_info = None
+
+    def __repr__(self):
+        return "FrameLayout(n1=%d, n=%d, k=%d)" % (self.n1, self.n, self.k)
+
+    @property
+    def frame_length(self):
+        return self.g * self.n
+
+    def _index(self, frame):
+        """Return the stream indices in the array type of frame."""
+        if _is_tensor(frame):
+            torch = sys.modules["torch"]
+            if self._torch_info is None:
+                self._torch_info = torch.from_numpy(self.info)
+            return self._torch_info.to(frame.device)
+        return self.info
+
+    def to_codewords(self, frames):
+        """Return the codewords of frames (g * n, B) as columns (n, B * g).
+
+        The g codewords of frame b are the columns b * g to (b + 1) * g, the
+        layout of `encode_stream` for B streams.
+        """
+        frames = frames.reshape(self.frame_length, -1)
+        return frames.T.reshape(-1, self.n).T
+
+    def to_frame(self, codewords):
+        """Inverse of `to_codewords`: (n, B * g) -> (g * n, B)."""
+        return codewords.T.reshape(-1, self.frame_length).T
+
+    def gather(self, frame):
+        """Return the values of the stream bits, frame (g * n, ...) ->
+        (n1, ...)."""
+        return frame[self._index(frame)]
+
+    def scatter(self, values, out):
+        """Write values (n1, ...) at the stream bit positions of the frame
+        `out` (g * n, ...) and return it."""
+        out[self._index(out)] = values
+        return out
+
+    def hard_decision(self, L):
+        """Return the stream bits decided from frame LLR (g * n, ...).
+
+        A bit is 1 if its LLR is negative.
+        """
+        return self.gather(L) < 0
+
+    def extrinsic(self, Lp, La):
+        """Return the extrinsic LLR of the stream bits as a frame.
+
+        Parameters
+        ----------
+        Lp: array (g * n, ...). A posteriori LLR of the frame.
+        La: array (n1, ...). A priori LLR of the stream bits.
+
+        Returns
+        -------
+        Le: array (g * n, ...). Lp - La at the stream bit positions, zero
+            elsewhere.
+
+        """
+        index = self._index(Lp)
+        Le = Lp.new_zeros(Lp.shape) if _is_tensor(Lp) else np.zeros_like(Lp)
+        Le[index] = Lp[index] - La
+        return Le
+
+
+def _is_tensor(x):
+    torch = sys.modules.get("torch")
+    return torch is not None and torch.is_tensor(x)
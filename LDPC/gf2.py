@@ -0,0 +1,179 @@
+"""Bit-packed linear algebra over GF(2).
+
+Binary matrices are stored with each row packed in uint64 words: bit j of a
+row is bit j % 64 of word j // 64. Adding two rows is then a XOR of
+n_cols / 64 words, which makes row reductions of large parity-check
+matrices fast and 64 times lighter than with int64 arrays.
+"""
+import numpy as np
+import scipy.sparse
+from numba import njit
+
+
+def pack(A):
+    """Pack the rows of a binary matrix into uint64 words.
+
+    Parameters
+    ----------
+    A: array or scipy.sparse matrix (m, n_cols) of 0 and 1.
+
+    Returns
+    -------
+    P: array (m, ceil(n_cols / 64)) of uint64.
+
+    """
+    m, n_cols = A.shape
+    n_words = -(-n_cols // 64)
+    if scipy.sparse.issparse(A):
+        A = scipy.sparse.coo_matrix(A)
+        mask = A.data % 2 == 1
+        rows, cols = A.row[mask], A.col[mask]
+        P = np.zeros((m, n_words), dtype=np.uint64)
+        np.bitwise_xor.at(P, (rows, cols // 64),
+                          np.left_shift(np.uint64(1),
+                                        (cols % 64).astype(np.uint64)))
+        return P
+    A = np.asarray(A)
+    bytes_ = np.packbits(A.astype(np.uint8), axis=1, bitorder="little")
+    padded = np.zeros((m, 8 * n_words), dtype=np.uint8)
+    padded[:, :bytes_.shape[1]] = bytes_
+    return padded.view("<u8").astype(np.uint64)
+
+
+def unpack(P, n_cols, dtype=int):
+    """Unpack a matrix packed by `pack` into an (m, n_cols) array."""
+    bytes_ = np.ascontiguousarray(P, dtype="<u8").view(np.uint8)
+    A = np.unpackbits(bytes_, axis=1, count=n_cols, bitorder="little")
+    return A.astype(dtype, copy=False)
+
+
+@njit(cache=True)
+def _rref(A, T, n_cols, track):
+    """Reduce packed A in place to its row reduced echelon form.
+
+    The pivot of column j is the first row below the previous pivot with a
+    1 in column j, as in `utils.gaussjordan`. If track, the row operations
+    are applied to T as well. Returns the pivot columns.
+    """
+    m, n_words = A.shape
+    pivots = np.empty(min(m, n_cols), dtype=np.int64)
+    pivot_old = -1
+    for j in range(n_cols):
+        w = j >> 6
+        bit = np.uint64(1) << np.uint64(j & 63)
+        pivot = -1
+        for r in range(pivot_old + 1, m):
+            if A[r, w] & bit:
+                pivot = r
+                break
+        if pivot >= 0:
+            pivot_old += 1
+            pivots[pivot_old] = j
+            if pivot != pivot_old:
+                for ww in range(n_words):
+                    aux = A[pivot, ww]
+                    A[pivot, ww] = A[pivot_old, ww]
+                    A[pivot_old, ww] = aux
+                if track:
+                    for ww in range(T.shape[1]):
+                        aux = T[pivot, ww]
+                        T[pivot, ww] = T[pivot_old, ww]
+                        T[pivot_old, ww] = aux
+            # the pivot row is zero left of column j
+            for i in range(m):
+                if i != pivot_old and A[i, w] & bit:
+                    for ww in range(w, n_words):
+                        A[i, ww] ^= A[pivot_old, ww]
+                    if track:
+                        for ww in range(T.shape[1]):
+                            T[i, ww] ^= T[pivot_old, ww]
+        if pivot_old == m - 1:
+            break
+    return pivots[:pivot_old + 1]
+
+
+@njit(cache=True)
+def _echelon(A, b, n_cols):
+    """Forward Gauss elimination of packed A in place, applied to b too.
+
+    Row j is the pivot of column j, as in `utils.gausselimination`.
+    """
+    n, n_words = A.shape
+    for j in range(min(n_cols, n)):
+        w = j >> 6
+        bit = np.uint64(1) << np.uint64(j & 63)
+        pivot = -1
+        for i in range(j, n):
+            if A[i, w] & bit:
+                pivot = i
+                break
+        if pivot < 0:
+            continue
+        if pivot != j:
+            for ww in range(n_words):
+                aux = A[j, ww]
+                A[j, ww] = A[pivot, ww]
+                A[pivot, ww] = aux
+            for ll in range(b.shape[1]):
+                aux2 = b[j, ll]
+                b[j, ll] = b[pivot, ll]
+                b[pivot, ll] = aux2
+        # row j is zero left of column j
+        for i in range(j + 1, n):
+            if A[i, w] & bit:
+                for ww in range(w, n_words):
+                    A[i, ww] ^= A[j, ww]
+                for ll in range(b.shape[1]):
+                    b[i, ll] = abs(b[i, ll] - b[j, ll])
+
+
+def rref(P, n_cols, transform=False):
+    """Compute the row reduced echelon form of a packed binary matrix.
+
+    Parameters
+    ----------
+    P: array (m, n_words) of uint64. Packed matrix, see `pack`.
+    n_cols: int. Number of columns of the matrix.
+    transform: boolean (default False). If True, also return the packed
+        (m, m) matrix T of the row operations, such that T X = rref(X).
+
+    Returns
+    -------
+    R: array (m, n_words). Packed row reduced form.
+    pivots: array (rank,). Pivot column of each nonzero row of R.
+    T: array (m, ceil(m / 64)). Packed transform, only if `transform`.
+
+    """
+    R = np.array(P, dtype=np.uint64, order="C")
+    m = R.shape[0]
+    if transform:
+        T = pack(np.identity(m, dtype=np.uint8))
+    else:
+        T = np.zeros((0, 0), dtype=np.uint64)
+    pivots = _rref(R, T, n_cols, transform)
+    if transform:
+        return R, pivots, T
+    return R, pivots
+
+
+def echelon(P, n_cols, b):
+    """Forward Gauss elimination of a packed binary matrix.
+
+    Parameters
+    ----------
+    P: array (n, n_words) of uint64. Packed matrix.
+    n_cols: int. Number of columns of the matrix.
+    b: array (n,) or (n, n_messages). Right-hand side(s), transformed with
+        the same row operations.
+
+    Returns
+    -------
+    R: array (n, n_words). Packed upper triangular form.
+    b: array. Transformed right-hand side(s).
+
+    """
+    R = np.array(P, dtype=np.uint64, order="C")
+    b = np.array(b)
+    b2 = b.reshape(b.shape[0], -1)
+    _echelon(R, b2, n_cols)
+    return R, b2.reshape(b.shape)
@@ -0,0 +1,181 @@
+"""Timers and counters of the decoder and of the relay stages.
+
+Instrumentation is off until a `Profile` is active::
+
+    with Profile("run") as profile:
+        ...
+    profile.save("run.json")
+    profile.save_chrome_trace("run.trace.json")  # chrome://tracing, Perfetto
+
+While no profile is active, `timer` returns a shared no-op context manager,
+`count` returns at once and the functions decorated with `timed` are called
+directly, so the instrumented code runs at full speed. The active profile is
+global to the process and shared by its threads.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+_active = None
+_NULL = contextlib.nullcontext()
+
+
+class Profile:
+    """Timed events and counters of a run.
+
+    Parameters
+    ----------
+    name: str, default "profile". Name of the run.
+
+    Attributes
+    ----------
+    events: list of (name, start, duration, thread id, args), with start
+        and duration in seconds since the profile was created.
+    counters: dict. Totals of the `count` calls.
+
+    """
+
+    def __init__(self, name="profile"):
+        self.name = name
+        self.events = []
+        self.counters = {}
+        self._t0 = time.perf_counter()
+        self._wall = None
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def __enter__(self):
+        global _active
+        self._previous = _active
+        _active = self
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        _active = self._previous
+        self._wall = time.perf_counter() - self._t0
+
+    def add_event(self, name, start, duration, args=None):
+        """Record an event of `duration` seconds started at perf_counter
+        time `start`."""
+        with self._lock:
+            self.events.append((name, start - self._t0, duration,
+                                threading.get_ident(), args or {}))
+
+    def count(self, name, value=1):
+        """Add value to the counter `name`."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def timers(self):
+        """Return {name: {"count", "total_s", "mean_s", "max_s"}} of the
+        events, by decreasing total time."""
+        stats = {}
+        for name, _, duration, _, _ in self.events:
+            count, total, longest = stats.get(name, (0, 0., 0.))
+            stats[name] = (count + 1, total + duration, max(longest, duration))
+        return {name: {"count": count, "total_s": total,
+                       "mean_s": total / count, "max_s": longest}
+                for name, (count, total, longest) in sorted(
+                    stats.items(), key=lambda item: -item[1][1])}
+
+    def to_dict(self):
+        """Return the profile as a JSON serializable dict with keys "name",
+        "wall_s", "timers", "counters" and "events"."""
+        wall = self._wall
+        if wall is None:
+            wall = time.perf_counter() - self._t0
+        return {"name": self.name, "wall_s": wall, "timers": self.timers(),
+                "counters": {key: _plain(value)
+                             for key, value in self.counters.items()},
+                "events": [{"name": name, "start_s": start,
+                            "duration_s": duration, "thread": thread,
+                            "args": _plain_args(args)}
+                           for name, start, duration, thread, args
+                           in self.events]}
+
+    def save(self, path):
+        """Write the profile as JSON (see `to_dict`)."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def save_chrome_trace(self, path):
+        """Write the events in the Chrome trace event format, viewable in
+        chrome://tracing or Perfetto; counters go to "otherData"."""
+        pid = os.getpid()
+        trace = [{"name": name, "ph": "X", "ts": 1e6 * start,
+                  "dur": 1e6 * duration, "pid": pid, "tid": thread,
+                  "args": _plain_args(args)}
+                 for name, start, duration, thread, args in self.events]
+        trace.append({"name": "process_name", "ph": "M", "pid": pid,
+                      "args": {"name": self.name}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms",
+                       "otherData": {key: _plain(value) for key, value
+                                     in self.counters.items()}}, f)
+
+
+def _plain(value):
+    # numpy scalars to JSON serializable Python numbers
+    return value.item() if hasattr(value, "item") else value
+
+
+def _plain_args(args):
+    return {key: _plain(value) if hasattr(value, "item") else
+            value if isinstance(value, (int, float, str, bool, type(None)))
+            else str(value) for key, value in args.items()}
+
+
+class _Timer:
+    __slots__ = ("profile", "name", "args", "start")
+
+    def __init__(self, profile, name, args):
+        self.profile = profile
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.add_event(self.name, self.start,
+                               time.perf_counter() - self.start, self.args)
+
+
+def active():
+    """Return the active Profile, or None if instrumentation is off."""
+    return _active
+
+
+def timer(name, **args):
+    """Return a context manager timing its block as an event `name` of the
+    active profile; args are recorded with the event."""
+    if _active is None:
+        return _NULL
+    return _Timer(_active, name, args)
+
+
+def count(name, value=1):
+    """Add value to the counter `name` of the active profile, if any."""
+    if _active is not None:
+        _active.count(name, value)
+
+
+def timed(name=None):
+    """Decorator timing every call of a function as an event `name`
+    (default: the function name)."""
+    def decorate(fn):
+        event = fn.__qualname__ if name is None else name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return fn(*args, **kwargs)
+            with _Timer(_active, event, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
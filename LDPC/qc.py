@@ -0,0 +1,467 @@
+"""Quasi-cyclic LDPC codes.
+
+A QC-LDPC code is described by a small base matrix and a lifting factor Z:
+every entry of the base matrix stands for a Z x Z block of H, either zero
+(entry -1) or the identity cyclically shifted by the entry. The description
+takes a few bytes whatever the code length, encoding is done with circulant
+shifts of Z-bits blocks instead of a dense generator matrix, and the
+decoder updates all the Z checks of a block row at once.
+
+The encoder requires the parity part of the base matrix (its last mb
+columns) to have the dual-diagonal structure of the IEEE 802.11n and
+802.16e codes: a first column of weight 3 whose circulants sum to a single
+circulant, followed by a staircase of identities.
+"""
+import numpy as np
+from numba import njit
+from scipy.sparse import csr_matrix
+
+from . import utils
+from .decoder import LDPCDecoder
+from .encoder import add_gaussian_noise
+
+
+class QCLDPC:
+    """Quasi-cyclic LDPC code defined by a base matrix and a lifting factor.
+
+    Parameters
+    ----------
+    base: array (mb, nb) of int. Shift of each Z x Z block of H, -1 for a
+        zero block.
+    Z: int. Lifting factor (circulant size).
+
+    Attributes
+    ----------
+    n: int. Code length nb * Z.
+    m: int. Number of parity-check equations mb * Z.
+    k: int. Number of information bits (nb - mb) * Z. The first k bits of a
+        codeword are the information bits.
+
+    """
+
+    def __init__(self, base, Z):
+        base = np.array(base, dtype=np.int64)
+        if base.ndim != 2:
+            raise ValueError("base must be a 2D array.")
+        if Z < 1:
+            raise ValueError("Z must be a positive integer, got %s." % Z)
+        if ((base < -1) | (base >= Z)).any():
+            raise ValueError("Shifts of the base matrix must be -1 or in "
+                             "[0, Z).")
+        self.base = base
+        self.Z = int(Z)
+        self.mb, self.nb = base.shape
+        if self.nb <= self.mb:
+            raise ValueError("base must have more columns than rows.")
+        self.m = self.mb * self.Z
+        self.n = self.nb * self.Z
+        self.k = self.n - self.m
+
+        # gather indices of the bits of each block row, one row per block:
+        # row r of a block with shift s at block column j holds bit
+        # j * Z + (r + s) % Z.
+        r = np.arange(self.Z)
+        self._layers = []
+        for i in range(self.mb):
+            cols = np.flatnonzero(base[i] >= 0)
+            shifts = base[i, cols]
+            self._layers.append(cols[:, None] * self.Z +
+                                (r + shifts[:, None]) % self.Z)
+        self._block_row, self._block_col = np.nonzero(base >= 0)
+        self._block_shift = base[self._block_row, self._block_col]
+        self._layer_ptr = np.searchsorted(self._block_row,
+                                          np.arange(self.mb + 1))
+        self._max_degree = np.diff(self._layer_ptr).max()
+        self._p0_shift = self._dual_diagonal_shift()
+
+    def __repr__(self):
+        return "QCLDPC(n=%d, k=%d, Z=%d)" % (self.n, self.k, self.Z)
+
+    def __eq__(self, other):
+        return (isinstance(other, QCLDPC) and self.Z == other.Z and
+                np.array_equal(self.base, other.base))
+
+    def to_dict(self):
+        """Return a JSON-serializable description of the code."""
+        return {"Z": self.Z, "base": self.base.tolist()}
+
+    @classmethod
+    def from_dict(cls, description):
+        """Build the code described by `to_dict`."""
+        return cls(description["base"], description["Z"])
+
+    @classmethod
+    def random(cls, mb, nb, Z, d_v=3, seed=None, max_tries=100):
+        """Build a random encodable QC-LDPC code.
+
+        The information columns have d_v random circulants each, with shifts
+        drawn so as to avoid 4-cycles when possible. The parity part has the
+        dual-diagonal structure of the 802.11n codes.
+
+        Parameters
+        ----------
+        mb: int. Number of block rows, at least 3.
+        nb: int. Number of block columns.
+        Z: int. Lifting factor.
+        d_v: int. Number of circulants of each information column.
+        seed: int, seed of the random generator.
+        max_tries: int. Number of draws of the shifts of a column before
+            accepting 4-cycles.
+
+        Returns
+        -------
+        code: QCLDPC.
+
+        """
+        if mb < 3:
+            raise ValueError("mb must be at least 3.")
+        if not 2 <= d_v <= mb:
+            raise ValueError("d_v must be between 2 and mb.")
+        if nb <= mb:
+            raise ValueError("nb must be greater than mb.")
+        rng = utils.check_random_state(seed)
+        kb = nb - mb
+        base = np.full((mb, nb), -1, dtype=np.int64)
+
+        # first parity column: shift 1 at the first and last block rows,
+        # identity in the middle; then the identity staircase.
+        base[[0, mb // 2, mb - 1], kb] = [1 % Z, 0, 1 % Z]
+        for j in range(1, mb):
+            base[[j - 1, j], kb + j] = 0
+
+        for j in range(kb):
+            rows = np.sort(rng.choice(mb, size=d_v, replace=False))
+            for _ in range(max_tries):
+                base[rows, j] = rng.randint(Z, size=d_v)
+                if not _has_4cycles(base[:, :kb + mb], j, Z):
+                    break
+        return cls(base, Z)
+
+    def parity_check_matrix(self, sparse=True):
+        """Expand the base matrix into the parity-check matrix H.
+
+        Returns
+        -------
+        H: scipy.sparse.csr_matrix or array (m, n).
+
+        """
+        rows = np.concatenate([
+            np.broadcast_to(i * self.Z + np.arange(self.Z), idx.shape).ravel()
+            for i, idx in enumerate(self._layers)])
+        cols = np.concatenate([idx.ravel() for idx in self._layers])
+        H = csr_matrix((np.ones(rows.size, dtype=int), (rows, cols)),
+                       shape=(self.m, self.n))
+        if not sparse:
+            H = H.toarray()
+        return H
+
+    def _dual_diagonal_shift(self):
+        """Return the shift of the sum of the first parity column circulants,
+        or None if the parity part does not have the dual-diagonal
+        structure."""
+        kb, mb = self.nb - self.mb, self.mb
+        staircase = np.full((mb, mb - 1), -1)
+        for j in range(1, mb):
+            staircase[[j - 1, j], j - 1] = 0
+        if not np.array_equal(self.base[:, kb + 1:], staircase):
+            return None
+        shifts = self.base[:, kb]
+        values, counts = np.unique(shifts[shifts >= 0], return_counts=True)
+        odd = values[counts % 2 == 1]
+        if odd.size != 1:
+            return None
+        return int(odd[0])
+
+    def _shifted(self, blocks, shift):
+        """Multiply Z-bits blocks (Z, ...) by the circulant of `shift`."""
+        return np.roll(blocks, -shift, axis=0)
+
+    def codewords(self, v):
+        """Encode binary messages with circulant shifts.
+
+        Parameters
+        ----------
+        v: array (k,) or (k, n_messages). Binary messages.
+
+        Returns
+        -------
+        d: array (n,) or (n, n_messages). Codewords, information bits first.
+
+        """
+        if self._p0_shift is None:
+            raise ValueError("The parity part of the base matrix does not "
+                             "have the dual-diagonal structure required by "
+                             "the encoder.")
+        v = np.asarray(v)
+        if v.shape[0] != self.k:
+            raise ValueError("Expected messages of %d bits, got %d."
+                             % (self.k, v.shape[0]))
+        Z, mb, kb = self.Z, self.mb, self.nb - self.mb
+        d = np.zeros((self.nb, Z) + v.shape[1:], dtype=np.int8)
+        d[:kb] = v.reshape((kb, Z) + v.shape[1:]) % 2
+
+        # lambda_i: syndrome of the information part in block row i
+        lam = np.zeros((mb, Z) + v.shape[1:], dtype=np.int8)
+        for i in range(mb):
+            for j in np.flatnonzero(self.base[i, :kb] >= 0):
+                lam[i] ^= self._shifted(d[j], self.base[i, j])
+
+        # the staircase columns cancel in the sum of all block rows, which
+        # leaves P^s p0 = sum_i lambda_i.
+        p0 = self._shifted(np.bitwise_xor.reduce(lam, axis=0),
+                           -self._p0_shift)
+        d[kb] = p0
+        p = np.zeros_like(p0)
+        for i in range(mb - 1):
+            p = p ^ lam[i]
+            if self.base[i, kb] >= 0:
+                p = p ^ self._shifted(p0, self.base[i, kb])
+            d[kb + 1 + i] = p
+        return d.reshape((self.n,) + v.shape[1:]).astype(int)
+
+    def encode(self, v, snr=None, seed=None):
+        """Encode binary messages and map them to BPSK symbols.
+
+        Same as `encode_groups` with the generator matrix of the code, which
+        is never built.
+
+        Parameters
+        ----------
+        v: array (k, n_messages) binary messages, one per column.
+        snr: float. Signal-Noise Ratio. SNR = 10log(1 / variance) in
+            decibels. If None, no noise is added.
+        seed: int, seed of the random generator.
+
+        Returns
+        -------
+        y: array (n, n_messages) coded messages + noise.
+
+        """
+        y = 1 - 2 * self.codewords(v)
+        if snr is not None:
+            y = add_gaussian_noise(y, snr, seed=seed)
+        return y
+
+    def syndrome(self, x):
+        """Return the syndrome H x of hard decisions x (n, ...), per block."""
+        x = np.asarray(x) % 2
+        return np.stack([np.bitwise_xor.reduce(x[idx], axis=0)
+                         for idx in self._layers])
+
+    def decoder(self, **kwargs):
+        """Return a `QCDecoder` of the code; kwargs are its solver settings."""
+        return QCDecoder(self, **kwargs)
+
+
+class QCDecoder(LDPCDecoder):
+    """Layered BP decoder working on the Z x Z blocks of a QC-LDPC code.
+
+    Each block row of the base matrix is a layer of Z checks which share no
+    bit, so the whole layer is updated at once: the bits of every circulant
+    are gathered into a contiguous (degree, Z, n_messages) array, the check
+    update runs over it with flat vectorizable loops, and the a posteriori
+    LLR are scattered back. The interface is that of `LDPCDecoder`, except
+    that the schedule is always layered, the solver is single-threaded and
+    the fixed-point dtype is not supported.
+
+    Parameters
+    ----------
+    code: QCLDPC.
+    algorithm: str, default "sum-product". Check-node update rule, see
+        `LDPCDecoder`.
+    alpha: float, default 0.8. Scaling factor of normalized min-sum.
+    beta: float, default 0.5. Offset of offset min-sum.
+    schedule: str, default "layered". Must be "layered"; kept for the
+        interface of `LDPCDecoder` (e.g. `configure`).
+    n_threads: None. Must be None, the solver is single-threaded.
+    dtype: str, default "float64". Precision of the LLR and messages,
+        "float64" or "float32".
+
+    """
+
+    def __init__(self, code, algorithm="sum-product", alpha=0.8, beta=0.5,
+                 schedule="layered", n_threads=None, dtype="float64"):
+        super().__init__(code.parity_check_matrix(), algorithm=algorithm,
+                         alpha=alpha, beta=beta, schedule=schedule,
+                         n_threads=n_threads, dtype=dtype)
+        self.code = code
+
+    def _setup(self):
+        if self.schedule != "layered":
+            raise ValueError("QCDecoder only runs the layered schedule, got "
+                             "%r." % self.schedule)
+        if self.n_threads is not None:
+            raise ValueError("QCDecoder is single-threaded, n_threads must "
+                             "be None, got %r." % self.n_threads)
+        super()._setup()
+        if self.dtype == np.int8:
+            raise ValueError("QCDecoder does not support the fixed-point "
+                             "mode.")
+
+    def _bp_decode(self, Lc, maxiter):
+        """Run block-layered BP with per-codeword early termination."""
+        code = self.code
+        n_messages = Lc.shape[1]
+        L = np.array(Lc, order="C")
+        Lr = np.zeros((code._block_col.size, code.Z, n_messages),
+                      dtype=L.dtype)
+        T = np.empty((code._max_degree, code.Z, n_messages), dtype=L.dtype)
+
+        L_out = np.empty(Lc.shape, dtype=L.dtype)
+        n_iters = np.full(n_messages, maxiter)
+        converged = np.zeros(n_messages, dtype=bool)
+        active = np.arange(n_messages)
+        for n_iter in range(maxiter):
+            done = _qc_layered(L, code._block_col, code._block_shift,
+                               code._layer_ptr, Lr, T, self._rule,
+                               self.alpha, self.beta)
+            n_iters[active[done]] = n_iter + 1
+            converged[active[done]] = True
+            if n_iter == maxiter - 1 or done.all():
+                L_out[:, active] = L
+                break
+            if done.any():
+                L_out[:, active[done]] = L[:, done]
+                keep = ~done
+                active = active[keep]
+                L = np.ascontiguousarray(L[:, keep])
+                Lr = np.ascontiguousarray(Lr[..., keep])
+                T = T[..., :active.size].copy()
+        return L_out, n_iters, converged
+
+
+@njit(nogil=True, cache=True)
+def _qc_layered(L, block_col, block_shift, layer_ptr, Lr, T, rule, alpha,
+                beta):
+    """Run one layered BP iteration over the block rows of a QC-LDPC code.
+
+    L (n, n_messages) holds the a posteriori LLR and Lr (n_blocks, Z,
+    n_messages) the check-to-bit messages of each circulant, both updated
+    in place. The Z rows of a circulant are two contiguous runs of L, and
+    the check update of a layer runs over flat Z * n_messages loops.
+    Returns whether each codeword satisfies the parity checks.
+    """
+    n_blocks, Z, n_messages = Lr.shape
+    size = Z * n_messages
+    Tf = T.reshape(T.shape[0], size)
+    Lrf = Lr.reshape(n_blocks, size)
+    X = np.empty(size)
+    min1 = np.empty(size)
+    min2 = np.empty(size)
+    argmin1 = np.empty(size, dtype=np.int64)
+    sign = np.empty(size)
+    tanh = np.empty((T.shape[0], size)) if rule == 0 else np.empty((0, 0))
+    for i in range(layer_ptr.shape[0] - 1):
+        b0 = layer_ptr[i]
+        deg = layer_ptr[i + 1] - b0
+        # gather the bit-to-check messages of the layer
+        for b in range(deg):
+            j0 = block_col[b0 + b] * Z
+            s = block_shift[b0 + b]
+            for r in range(Z):
+                src = j0 + (r + s) % Z
+                for ll in range(n_messages):
+                    T[b, r, ll] = L[src, ll] - Lr[b0 + b, r, ll]
+
+        if rule == 0:
+            # product of the other tanh of each check: prefix products
+            # are stored in Lr, then multiplied by the suffix products.
+            for p in range(size):
+                X[p] = 1.
+            for b in range(deg):
+                for p in range(size):
+                    Lrf[b0 + b, p] = X[p]
+                    tanh[b, p] = np.tanh(0.5 * Tf[b, p])
+                    X[p] *= tanh[b, p]
+            for p in range(size):
+                X[p] = 1.
+            for b in range(deg - 1, -1, -1):
+                for p in range(size):
+                    x = Lrf[b0 + b, p] * X[p]
+                    X[p] *= tanh[b, p]
+                    num = 1 + x
+                    denom = 1 - x
+                    if num == 0:
+                        Lrf[b0 + b, p] = -1
+                    elif denom == 0:
+                        Lrf[b0 + b, p] = 1
+                    else:
+                        Lrf[b0 + b, p] = np.log(num / denom)
+        else:
+            for p in range(size):
+                min1[p] = np.inf
+                min2[p] = np.inf
+                sign[p] = 1.
+            for b in range(deg):
+                for p in range(size):
+                    v = Tf[b, p]
+                    if v < 0:
+                        sign[p] = -sign[p]
+                        v = -v
+                    if v < min1[p]:
+                        min2[p] = min1[p]
+                        min1[p] = v
+                        argmin1[p] = b
+                    elif v < min2[p]:
+                        min2[p] = v
+            for b in range(deg):
+                for p in range(size):
+                    if argmin1[p] == b:
+                        mag = min2[p]
+                    else:
+                        mag = min1[p]
+                    if rule == 2:
+                        mag *= alpha
+                    elif rule == 3:
+                        mag = max(mag - beta, 0.)
+                    if Tf[b, p] < 0:
+                        Lrf[b0 + b, p] = -sign[p] * mag
+                    else:
+                        Lrf[b0 + b, p] = sign[p] * mag
+
+        # scatter the a posteriori LLR back
+        for b in range(deg):
+            j0 = block_col[b0 + b] * Z
+            s = block_shift[b0 + b]
+            for r in range(Z):
+                dst = j0 + (r + s) % Z
+                for ll in range(n_messages):
+                    L[dst, ll] = T[b, r, ll] + Lr[b0 + b, r, ll]
+
+    # syndrome of the hard decisions, a block row at a time
+    satisfied = np.ones(n_messages, dtype=np.bool_)
+    parity = np.empty((Z, n_messages), dtype=np.bool_)
+    for i in range(layer_ptr.shape[0] - 1):
+        parity[:] = False
+        for b in range(layer_ptr[i], layer_ptr[i + 1]):
+            j0 = block_col[b] * Z
+            s = block_shift[b]
+            for r in range(Z):
+                src = j0 + (r + s) % Z
+                for ll in range(n_messages):
+                    if L[src, ll] <= 0:
+                        parity[r, ll] = not parity[r, ll]
+        for r in range(Z):
+            for ll in range(n_messages):
+                if parity[r, ll]:
+                    satisfied[ll] = False
+    return satisfied
+
+
+def _has_4cycles(base, j, Z):
+    """Return whether column j of a base matrix closes a 4-cycle.
+
+    Columns j and l close a 4-cycle through block rows i and i2 if
+    base[i, j] - base[i2, j] + base[i2, l] - base[i, l] = 0 modulo Z.
+    """
+    rows = np.flatnonzero(base[:, j] >= 0)
+    for a in range(len(rows)):
+        for b in range(a + 1, len(rows)):
+            i, i2 = rows[a], rows[b]
+            both = (base[i] >= 0) & (base[i2] >= 0)
+            both[j] = False
+            diff = (base[i, j] - base[i2, j] + base[i2, both] -
+                    base[i, both]) % Z
+            if (diff == 0).any():
+                return True
+    return False
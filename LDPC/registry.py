@@ -0,0 +1,178 @@
+"""Persistent registry of LDPC codes."""
+import numbers
+import os
+import tempfile
+
+import numpy as np
+import scipy.sparse
+
+from .code import make_ldpc
+from .decoder import LDPCDecoder
+
+# codes and decoders of integer seeds, shared by all callers
+_codes = {}
+_decoders = {}
+_coding_matrices = {}
+
+
+def default_cache_dir():
+    """Return the on-disk cache directory of the code registry.
+
+    It can be set with the `LDPC_CACHE_DIR` environment variable and
+    defaults to `~/.cache/ldpc`.
+    """
+    return os.environ.get("LDPC_CACHE_DIR",
+                          os.path.join(os.path.expanduser("~"), ".cache",
+                                       "ldpc"))
+
+
+def _cache_path(key, cache_dir):
+    n_code, d_v, d_c, seed, systematic = key
+    fname = "ldpc-n%d-dv%d-dc%d-seed%d-%s.npz" % (
+        n_code, d_v, d_c, seed, "sys" if systematic else "gen")
+    return os.path.join(cache_dir, fname)
+
+
+def _memoized(seed):
+    """Return True if the codes of seed are memoized: integer seeds only,
+    None and RandomState instances draw a new code on every call."""
+    return isinstance(seed, numbers.Integral)
+
+
+def _read_only(X):
+    """Make the arrays of a dense or sparse matrix read-only."""
+    arrays = ((X.data, X.indices, X.indptr) if scipy.sparse.issparse(X)
+              else (X,))
+    for array in arrays:
+        array.setflags(write=False)
+    return X
+
+
+def get_ldpc(n_code, d_v, d_c, seed=None, systematic=False, sparse=True,
+             cache_dir=None):
+    """Return the LDPC matrices H and G, building them only once.
+
+    Codes are memoized in process and persisted to an `.npz` file keyed by
+    `(n_code, d_v, d_c, seed, systematic)`, so later runs and worker
+    processes load them instead of running the Gauss-Jordan reductions of
+    `make_ldpc` again.
+
+    Parameters
+    ----------
+    n_code: int, Length of the codewords.
+    d_v: int, Number of parity-check equations including a certain bit.
+    d_c: int, Number of bits in the same parity-check equation.
+    seed: int, np.random.RandomState or None, seed of the random
+        generator. Only codes of integer seeds are cached: with None or a
+        RandomState, a new random code is built on every call.
+    systematic: boolean, default False. if True, constructs a systematic
+        coding matrix G.
+    sparse: boolean, default True. Passed to `make_ldpc`.
+    cache_dir: str, default None. Directory of the on-disk cache; if None,
+        `default_cache_dir()` is used. If False, codes are only memoized in
+        process.
+
+    Returns
+    -------
+    H: array (n_equations, n_code). Parity check matrix.
+    G: (n_code, n_bits) array coding matrix.
+
+    The cached H and G are shared by all the callers of the process and
+    read-only; copy them before modifying them.
+
+    """
+    if not _memoized(seed):
+        return make_ldpc(n_code, d_v, d_c, systematic=systematic,
+                         sparse=sparse, seed=seed)
+
+    key = (n_code, d_v, d_c, int(seed), bool(systematic))
+    if key in _codes:
+        return _codes[key]
+
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    path = _cache_path(key, cache_dir) if cache_dir else None
+
+    if path is not None and os.path.exists(path):
+        with np.load(path) as data:
+            H = data["H"].astype(int)
+            G = data["G"].astype(int)
+    else:
+        H, G = make_ldpc(n_code, d_v, d_c, systematic=systematic,
+                         sparse=sparse, seed=int(seed))
+        if path is not None:
+            _save(path, H, G)
+
+    _codes[key] = _read_only(H), _read_only(G)
+    return H, G
+
+
+def get_decoder(n_code, d_v, d_c, seed=None, systematic=False,
+                cache_dir=None, **kwargs):
+    """Return an `LDPCDecoder` of the code of `get_ldpc`, built only once.
+
+    Parameters are those of `get_ldpc`; kwargs are the solver settings of
+    `LDPCDecoder`. Decoders are memoized in process for integer seeds.
+    The returned decoder reuses its buffers between calls; use its
+    `configure` method to get a copy for another thread.
+    """
+    H, _ = get_ldpc(n_code, d_v, d_c, seed=seed, systematic=systematic,
+                    cache_dir=cache_dir)
+    if not _memoized(seed):
+        return LDPCDecoder(H, **kwargs)
+
+    key = (n_code, d_v, d_c, int(seed), bool(systematic),
+           tuple(sorted(kwargs.items())))
+    if key not in _decoders:
+        _decoders[key] = LDPCDecoder(H, **kwargs)
+    return _decoders[key]
+
+
+def get_coding_matrix(n_code, d_v, d_c, seed=None, systematic=False,
+                      cache_dir=None):
+    """Return the coding matrix G of `get_ldpc` as a
+    scipy.sparse.csr_matrix, converted only once.
+
+    Parameters are those of `get_ldpc`. The sparse matrix is memoized in
+    process for integer seeds, and then read-only; `encode_groups` and
+    `encode_stream` use it without converting G on every call.
+    """
+    _, G = get_ldpc(n_code, d_v, d_c, seed=seed, systematic=systematic,
+                    cache_dir=cache_dir)
+    if not _memoized(seed):
+        return scipy.sparse.csr_matrix(G)
+
+    key = (n_code, d_v, d_c, int(seed), bool(systematic))
+    if key not in _coding_matrices:
+        _coding_matrices[key] = _read_only(scipy.sparse.csr_matrix(G))
+    return _coding_matrices[key]
+
+
+def _save(path, H, G):
+    """Write H and G atomically so concurrent workers never see a partial
+    file."""
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix=".npz", dir=cache_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, H=np.asarray(H, dtype=np.uint8),
+                                G=np.asarray(G, dtype=np.uint8))
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def clear_cache(disk=False, cache_dir=None):
+    """Forget memoized codes, and the on-disk cache if `disk` is True."""
+    _codes.clear()
+    _decoders.clear()
+    _coding_matrices.clear()
+    if disk:
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        if os.path.isdir(cache_dir):
+            for fname in os.listdir(cache_dir):
+                if fname.startswith("ldpc-") and fname.endswith(".npz"):
+                    os.remove(os.path.join(cache_dir, fname))
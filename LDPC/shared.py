@@ -0,0 +1,144 @@
+"""LDPC codes in shared memory, attached without copy by worker processes."""
+from multiprocessing import shared_memory
+
+import numpy as np
+import scipy.sparse
+
+from . import utils
+from .decoder import LDPCDecoder
+
+_ALIGN = 64
+
+
+def _share(arrays):
+    """Copy named arrays into a new shared memory block.
+
+    Returns the block and its layout, a list of (name, dtype, shape,
+    offset) with offsets aligned on cache lines.
+    """
+    layout = []
+    size = 0
+    for name, array in arrays.items():
+        size = -(-size // _ALIGN) * _ALIGN
+        layout.append((name, array.dtype.str, array.shape, size))
+        size += array.nbytes
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for (name, _, _, offset), array in zip(layout, arrays.values()):
+        _view(shm, array.dtype, array.shape, offset)[...] = array
+    return shm, layout
+
+
+def _view(shm, dtype, shape, offset):
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+
+
+def _add_matrix(arrays, name, X):
+    """Add matrix X to the arrays to share, in CSR form if sparse; return
+    its shape if sparse, None if dense."""
+    if scipy.sparse.issparse(X):
+        X = scipy.sparse.csr_matrix(X)
+        arrays.update({name + "_data": X.data, name + "_indices": X.indices,
+                       name + "_indptr": X.indptr})
+        return X.shape
+    arrays[name] = np.asarray(X)
+    return None
+
+
+def _get_matrix(arrays, name, shape):
+    # inverse of _add_matrix, on the shared views
+    if shape is None:
+        return arrays[name]
+    return scipy.sparse.csr_matrix(
+        (arrays[name + "_data"], arrays[name + "_indices"],
+         arrays[name + "_indptr"]), shape=shape, copy=False)
+
+
+class SharedCode:
+    """Parity-check matrix, coding matrix and decoder edges in shared memory.
+
+    The parent process copies the code once into a shared memory block with
+    `SharedCode(H, G)` and passes the picklable `spec` to its workers, which
+    call `SharedCode.attach(spec)`: their H, G and decoder edge indices are
+    views of the block, so neither the matrices nor the edges of
+    `LDPCDecoder` are copied or recomputed per worker. These arrays must
+    not be modified.
+
+    The creator owns the block: `close` releases it there once the workers
+    are done. It can be used as a context manager.
+
+    Parameters
+    ----------
+    H: array or scipy.sparse matrix (n_equations, n_code). Parity-check
+        matrix; sparse matrices are shared in CSR form.
+    G: array or scipy.sparse matrix (n_code, n_bits). Coding matrix, shared
+        like H.
+    decoder: LDPCDecoder, default None. Decoder of H whose edge indices are
+        shared; if None, they are computed from H.
+
+    Attributes
+    ----------
+    H: array or scipy.sparse.csr_matrix. Parity-check matrix.
+    G: array or scipy.sparse.csr_matrix. Coding matrix.
+    edges: tuple of arrays. Edge indices of the decoders of H.
+
+    """
+
+    def __init__(self, H, G, decoder=None):
+        edges = utils._edges(H) if decoder is None else decoder.edges
+        arrays = {}
+        shapes = {"H": _add_matrix(arrays, "H", H),
+                  "G": _add_matrix(arrays, "G", G)}
+        arrays.update(zip(("row_ptr", "edge_var", "col_ptr", "col_edges"),
+                          edges))
+        self._shm, layout = _share(arrays)
+        self._owner = True
+        self.spec = (self._shm.name, layout, shapes)
+        self._load(layout, shapes)
+
+    @classmethod
+    def attach(cls, spec):
+        """Return the SharedCode of `spec` created by another process."""
+        name, layout, shapes = spec
+        shared = cls.__new__(cls)
+        shared._shm = shared_memory.SharedMemory(name=name)
+        shared._owner = False
+        shared.spec = spec
+        shared._load(layout, shapes)
+        return shared
+
+    def _load(self, layout, shapes):
+        arrays = {}
+        for name, dtype, shape, offset in layout:
+            arrays[name] = _view(self._shm, np.dtype(dtype), shape, offset)
+        self.H = _get_matrix(arrays, "H", shapes["H"])
+        self.G = _get_matrix(arrays, "G", shapes["G"])
+        self.edges = tuple(arrays[name] for name in
+                           ("row_ptr", "edge_var", "col_ptr", "col_edges"))
+
+    def decoder(self, **kwargs):
+        """Return an `LDPCDecoder` of H using the shared edge indices.
+
+        kwargs are the solver settings of `LDPCDecoder`.
+        """
+        return LDPCDecoder(self.H, edges=self.edges, **kwargs)
+
+    def close(self):
+        """Detach from the block, and free it if this process created it.
+
+        The arrays of this SharedCode and of its decoders must not be used
+        afterwards.
+        """
+        self.H = self.G = self.edges = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # views are still referenced, the mapping is released with them
+            pass
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -4,6 +4,8 @@ import numbers
 import numpy as np
 import scipy
 from scipy.stats import norm
+
+from . import gf2
 pi = math.pi
 
 
@@ -38,6 +40,8 @@ def binaryproduct(X, Y):
 def gaussjordan(X, change=0):
     """Compute the binary row reduced echelon form of X.
 
+    Rows are reduced bit-packed, see `gf2.rref`.
+
     Parameters
     ----------
     X: array (m, n)
@@ -52,50 +56,22 @@ def gaussjordan(X, change=0):
         A: array (m, n). row reduced form of X.
 
     """
-    A = np.copy(X)
-    m, n = A.shape
+    m, n = X.shape
+    dtype = X.dtype if isinstance(X, np.ndarray) else int
 
     if change:
-        P = np.identity(m).astype(int)
-
-    pivot_old = -1
-    for j in range(n):
-        filtre_down = A[pivot_old+1:m, j]
-        pivot = np.argmax(filtre_down)+pivot_old+1
-
-        if A[pivot, j]:
-            pivot_old += 1
-            if pivot_old != pivot:
-                aux = np.copy(A[pivot, :])
-                A[pivot, :] = A[pivot_old, :]
-                A[pivot_old, :] = aux
-                if change:
-                    aux = np.copy(P[pivot, :])
-                    P[pivot, :] = P[pivot_old, :]
-                    P[pivot_old, :] = aux
-
-            for i in range(m):
-                if i != pivot_old and A[i, j]:
-                    if change:
-                        P[i, :] = abs(P[i, :]-P[pivot_old, :])
-                    A[i, :] = abs(A[i, :]-A[pivot_old, :])
-
-        if pivot_old == m-1:
-            break
+        R, _, T = gf2.rref(gf2.pack(X), n, transform=True)
+        return gf2.unpack(R, n, dtype), gf2.unpack(T, m, int)
 
-    if change:
-        return A, P
-    return A
+    R, _ = gf2.rref(gf2.pack(X), n)
+    return gf2.unpack(R, n, dtype)
 
 
 def binaryrank(X):
     """Compute rank of a binary Matrix using Gauss-Jordan algorithm."""
-    A = np.copy(X)
-    m, n = A.shape
-
-    A = gaussjordan(A)
+    _, pivots = gf2.rref(gf2.pack(X), X.shape[1])
 
-    return sum([a.any() for a in A])
+    return len(pivots)
 
 
 def f1(y, sigma):
@@ -125,6 +101,28 @@ def _bitsandnodes(H):
     return bits_histogram, bits, nodes_histogram, nodes
 
 
+def _edges(H):
+    """Return the CSR / CSC edge indices of a parity-check matrix H.
+
+    Edges (the nonzeros of H) are numbered in row-major order, so that the
+    edges of check node i are ``range(row_ptr[i], row_ptr[i + 1])`` and
+    ``edge_var[e]`` is the bit connected by edge e. The edges of bit j are
+    ``col_edges[col_ptr[j]: col_ptr[j + 1]]``, in increasing check order.
+    """
+    H = scipy.sparse.csr_matrix(H, dtype=np.int64, copy=True)
+    H.eliminate_zeros()
+    H.sort_indices()
+    m, n = H.shape
+
+    row_ptr = H.indptr.astype(np.int64)
+    edge_var = H.indices.astype(np.int64)
+    col_edges = np.argsort(edge_var, kind="stable").astype(np.int64)
+    col_ptr = np.zeros(n + 1, dtype=np.int64)
+    col_ptr[1:] = np.cumsum(np.bincount(edge_var, minlength=n))
+
+    return row_ptr, edge_var, col_ptr, col_edges
+
+
 def bits2i(H, i):
     """Compute list of variables (bits) connected to Parity node i."""
     if type(H) != scipy.sparse.csr_matrix:
@@ -160,34 +158,12 @@ def incode(H, x):
 
 def gausselimination(A, b):
     """Solve linear system in Z/2Z via Gauss Gauss elimination."""
-    if type(A) == scipy.sparse.csr_matrix:
-        A = A.toarray().copy()
-    else:
-        A = A.copy()
-    b = b.copy()
     n, k = A.shape
+    dtype = A.dtype if isinstance(A, np.ndarray) else int
+
+    R, b = gf2.echelon(gf2.pack(A), k, b)
 
-    for j in range(min(k, n)):
-        listedepivots = [i for i in range(j, n) if A[i, j]]
-        if len(listedepivots):
-            pivot = np.min(listedepivots)
-        else:
-            continue
-        if pivot != j:
-            aux = (A[j, :]).copy()
-            A[j, :] = A[pivot, :]
-            A[pivot, :] = aux
-
-            aux = b[j].copy()
-            b[j] = b[pivot]
-            b[pivot] = aux
-
-        for i in range(j+1, n):
-            if A[i, j]:
-                A[i, :] = abs(A[i, :]-A[j, :])
-                b[i] = abs(b[i]-b[j])
-
-    return A, b
+    return gf2.unpack(R, k, dtype), b
 
 
 def check_random_state(seed):
@@ -1,6 +1,6 @@
 import numpy as np
 
-from .utils import int2bitarray, bitarray2int
+from .utils_bits import int2bits, bits2int
 
 
 def audio2bin(audio_array):
@@ -11,26 +11,15 @@ def audio2bin(audio_array):
     else:
         audio = audio_array
 
-    length = audio.size
-
     # Translate audio by 2^15 so as to make its dtype unsigned.
-    audio = audio + 2 ** 15
-
-    audio_bin = np.zeros(shape=(length, 17), dtype=int)
-    for i in range(length):
-        audio_bin[i, :] = int2bitarray(audio[i], 17)
+    audio = audio.astype(int) + 2 ** 15
 
-    return audio_bin
+    return int2bits(audio, 17)
 
 
 def bin2audio(audio_bin):
     """Convert a 17-bits binary array to an audio array."""
-    length = audio_bin.shape[0]
-
-    audio = np.zeros(length, dtype=int)
-
-    for i in range(length):
-        audio[i] = bitarray2int(audio_bin[i, :])
+    audio = bits2int(audio_bin)
 
     # Translate audio by - 2^15 so as to make its dtype signed int16.
 
@@ -0,0 +1,63 @@
+"""Vectorized conversion between unsigned integers and bit arrays."""
+import numpy as np
+
+
+def _word_dtype(width):
+    """Return the smallest big-endian unsigned dtype holding `width` bits."""
+    if not 0 < width <= 64:
+        raise ValueError("width must be between 1 and 64, got %s." % width)
+    for n_bytes in (1, 2, 4, 8):
+        if width <= 8 * n_bytes:
+            return np.dtype(">u%d" % n_bytes)
+
+
+def int2bits(values, width, dtype=int):
+    """Convert unsigned integers to their `width`-bits binary representation.
+
+    Vectorized equivalent of `utils.int2bitarray` over arrays of any shape,
+    most significant bit first. Only the `width` lowest bits are kept.
+
+    Parameters
+    ----------
+    values: array (...). Non-negative integers.
+    width: int. Number of bits per value (e.g. 8 for images, 17 for audio).
+    dtype: data type of the returned bits.
+
+    Returns
+    -------
+    bits: array (..., width) of 0 and 1.
+
+    """
+    word = _word_dtype(width)
+    values = np.asarray(values)
+    words = np.ascontiguousarray(values, dtype=word)
+    bits = np.unpackbits(words.view(np.uint8).reshape(values.shape +
+                                                      (word.itemsize,)),
+                         axis=-1)
+    return bits[..., 8 * word.itemsize - width:].astype(dtype, copy=False)
+
+
+def bits2int(bits, dtype=int):
+    """Convert binary representations (most significant bit first) to integers.
+
+    Vectorized equivalent of `utils.bitarray2int` over the last axis of
+    `bits`, which holds the `width` bits of each value.
+
+    Parameters
+    ----------
+    bits: array (..., width) of 0 and 1.
+    dtype: data type of the returned integers.
+
+    Returns
+    -------
+    values: array (...).
+
+    """
+    bits = np.asarray(bits)
+    width = bits.shape[-1]
+    word = _word_dtype(width)
+    padded = np.zeros(bits.shape[:-1] + (8 * word.itemsize,), dtype=np.uint8)
+    padded[..., 8 * word.itemsize - width:] = bits
+    packed = np.packbits(padded, axis=-1)
+    values = packed.view(word).reshape(bits.shape[:-1])
+    return values.astype(dtype)
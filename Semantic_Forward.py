@@ -2,8 +2,19 @@
 # encoding: utf-8
 '''Example codes for https://arxiv.org/abs/2310.07987'''
 
+import atexit
+import collections
+import concurrent.futures
+import contextlib
 import csv
+import glob
+import itertools
+import multiprocessing
 import os
+import queue
+import threading
+import time
+import uuid
 import copy
 import warnings
 import imageio
@@ -13,7 +24,6 @@ import numpy as np
 import torch
 from torch import nn
 from torch.utils.data import DataLoader
-from torch.autograd import Variable
 import torchvision.datasets as datasets
 
 import LDPC
@@ -29,38 +39,42 @@ device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 print('device:', device)
 
 seed = None
+ldpc_seed = 0  # fixed LDPC code, built once and loaded from the code cache
+ldpc_n = 900  # LDPC codeword length
+ldpc_dv = 2  # Number of parity-check equations including a certain bit
+ldpc_dc = 3  # Number of bits in the same parity-check equation
+snr2 = 20  # SNR of the second link in decibels
+n_rounds = 8  # joint decoding rounds
+images_per_epoch = 32
+save_images = True  # merged PNGs of every point and round, under images/snr*-rho*
+e = 0  # epoch of the images saved by sf_relay
+n_workers = None  # processes of the sweep, one per core if None; 1 runs the threaded pipeline
+profile_dir = None  # if set, a JSON profile and a Chrome trace of each run are written there
+results_path = 'images/relay'  # results store of sf_relay
 rng = np.random.RandomState(seed)
 
 
 def scale_8bit_weight(x):
     n = x.size()[1]  # sequence length
-    w = range(8, 0, -1)  # np.power(2, range(7, -1, -1))
-    for i in range(n):
-        x[0, i] = x[0, i] * w[i % 8]
+    w = 8 - torch.arange(n) % 8  # 8, 7, ..., 1 for the bits of each byte
+    x.mul_(w.to(x.dtype))
     return x
 
 
+@LDPC.instrument.timed()
 def img2bin(x1):
-    x = copy.deepcopy(x1).reshape(1, -1)  # convert to vector
+    x = x1.detach().cpu().reshape(x1.shape[0], -1)  # one vector per image
     x = (x / 2 + 0.5) * 255  # inverse of regularization
-    n = x.size()[1]  # sequence length
-    y = torch.zeros([1, n * 8], dtype=int)
-    for i in range(n):
-        x2 = bin(int(min(max(x[0, i].item(), 0), 255)))[2:].zfill(8)
-        # print(bin(int(x[0, i].item())),x2)
-        for j in range(8):
-            y[0, i * 8 + j] = int(x2[j])
+    x = np.clip(x.numpy(), 0, 255).astype(np.uint8)
+    y = torch.from_numpy(LDPC.int2bits(x, 8).reshape(x.shape[0], -1))
     return y
 
 
+@LDPC.instrument.timed()
 def bin2img(y):
-    n = int(y.size()[1] / 8)  # sequence length
-    x = torch.zeros([1, n], dtype=torch.float)
-    for i in range(n):
-        arr = np.array(y[0, i * 8: (i + 1) * 8])
-        y2 = ''.join(str(i) for i in arr)
-        for j in range(8):
-            x[0, i] = int(y2, 2)  # bin to digital
+    n = int(y.shape[1] / 8)  # sequence length
+    x = LDPC.bits2int(np.asarray(y).reshape(y.shape[0], n, 8))  # bin to digital
+    x = torch.from_numpy(x).type(torch.float)
     x = (x / 255. - 0.5) * 2  # regularization again
     return x
 
@@ -75,9 +89,9 @@ def data_tf(x):
 
 
 def merge_images(sources, targets, k=10):
-    _, _, h, w = sources.shape
-    row = int(np.sqrt(batch_size))
-    merged = np.zeros([3, row * h, row * w * 2])
+    b, _, h, w = sources.shape
+    row = int(np.ceil(np.sqrt(b)))
+    merged = np.zeros([3, int(np.ceil(b / row)) * h, row * w * 2])
 
     for idx, (s, t) in enumerate(zip(sources, targets)):
         i = idx // row
@@ -97,75 +111,47 @@ def to_data(x):
     return y.data.numpy()
 
 
-def calc_exinfo(Lp1, La1, g1, n1, n, k):
-    X = torch.zeros_like(Lp1)
-    for gi in range(g1 - 1):
-        si = gi * k
-        ei = (gi + 1) * k
-        sni = gi * n
-        eni = gi * n + k
-        X[sni:eni] = Lp1[sni:eni] - La1[si:ei]
-    sni = (g1 - 1) * n
-    eni = (g1 - 1) * (n - k) + n1
-    X[sni:eni] = Lp1[sni:eni] - La1[(g1 - 1) * k:]
-    return X
+def calc_exinfo(Lp1, La1, layout):
+    # a posteriori minus a priori LLR at the information bits, one gather
+    return layout.extrinsic(Lp1, La1)
 
 
-def LDPC_enc(G, X1):
-    n1 = X1.size()[1]
-    n, k = G.shape  # n: code length, k: information bits length
-    g1 = int(np.ceil(n1 / k))  # divide into groups
-    C1 = torch.zeros([n * g1, 1])
-    for gi in range(g1):
-        X_g = torch.zeros([k, 1])  # padding "0" at the end of the last group
-        si = gi * k
-        ei = min((gi + 1) * k, n1)
-        X_g[0:ei - si, 0] = X1[0, si:ei]
-        C1[gi * n:(gi + 1) * n] = torch.tensor(LDPC.encode(G, X_g))
-    return C1
-
-
-def LDPC_dec_LLR(Lp1, DEC_para1, g1, n1, n, k, La, maxiter):
-    for gi in range(g1):
-        si = gi * n
-        ei = (gi + 1) * n
-        Lp = Lp1[si:ei]
-        if La is None:
-            La1 = None
-        else:
-            ski = gi * k
-            if gi < g1 - 1:
-                La1 = torch.zeros(1, n)
-                eki = (gi + 1) * k
-                La1[0, :k] = La[0, ski:eki]
-            else:
-                La1 = torch.ones(1, n)  # last bits are all 0，LLR should be positive
-                La1[0, :n1 - ski] = La[0, ski:n1]
-        Lp1[si:ei] = LDPC.decode_LLR(Lp, **DEC_para1, La=La1, maxiter=maxiter)
+@LDPC.instrument.timed()
+def LDPC_enc(G, X1, layout):
+    # padding "0" at the end of the last group, all groups of all images
+    # encoded at once; one frame of g codewords per image (column)
+    C1 = LDPC.encode_stream(G, np.asarray(X1), systematic=True)
+    return torch.tensor(layout.to_frame(C1), dtype=torch.float32)
+
+
+@LDPC.instrument.timed()
+def LDPC_dec_LLR(Lp1, DEC_para1, layout, La, maxiter):
+    Lp = layout.to_codewords(Lp1)  # one codeword per column, B * g columns
+    if La is None:
+        La1 = None
+    else:
+        La1 = np.zeros([layout.frame_length, Lp1.shape[1]], dtype=np.float32)
+        La1[-layout.n:] = 1  # last bits are all 0，LLR should be positive
+        layout.scatter(np.asarray(La).T, La1)
+        La1 = layout.to_codewords(La1).T
+    # all groups of all images are decoded together in one solver call
+    Lp1[:] = layout.to_frame(LDPC.decode_LLR(Lp, **DEC_para1, La=La1, maxiter=maxiter))
     return Lp1
 
 
-def hard_decision(Lp2, g1, n1, n, k):
-    X = torch.zeros([1, n1], dtype=int)
-    for gi in range(g1 - 1):
-        si = gi * k
-        ei = (gi + 1) * k
-        sni = gi * n
-        eni = gi * n + k
-        X[0, si:ei] = torch.tensor((Lp2[sni:eni] < 0).T)
-    X[0, (g1 - 1) * k:] = torch.tensor((Lp2[(g1 - 1) * n:(g1 - 1) * (n - k) + n1] < 0).T)
-    return X
+@LDPC.instrument.timed()
+def hard_decision(Lp2, layout):
+    # (g * n, B) frame LLR -> (B, n1) bits
+    return torch.as_tensor(layout.hard_decision(Lp2)).T.long()
 
 
-def LDPC_dec_init(H, Y1, snr1, g1, n):
-    Lc1 = torch.zeros_like(Y1)
-    for gi in range(g1):
-        si = gi * n
-        ei = (gi + 1) * n
-        Lc1[si:ei], DEC_para1 = LDPC.decoder_init(H, Y1[si:ei], snr1)
-    return np.array(Lc1), DEC_para1
+def LDPC_dec_init(decoder, Y1, snr1):
+    # channel LLR of the whole stream, the decoder is shared by all groups
+    Lc1, DEC_para1 = LDPC.decoder_init(decoder.H, np.asarray(Y1), snr1, decoder=decoder)
+    return Lc1, DEC_para1
 
 
+@LDPC.instrument.timed()
 def save_img(img, path):
     imageio.imwrite(path, Image.fromarray(np.uint8(img * 255)))
 
@@ -189,6 +175,7 @@ class SemanticNN(nn.Module):
         self.tconv4 = nn.ConvTranspose2d(out_ch, out_ch, kernel_size=3, stride=2, padding=0)
         self.tconv5 = nn.ConvTranspose2d(out_ch, 3, kernel_size=2, stride=1, padding=0)
 
+    @LDPC.instrument.timed()
     def enc(self, x):
         out = self.conv1(x.to(device))
         out = self.conv2(out)
@@ -196,7 +183,7 @@ class SemanticNN(nn.Module):
 
         # scale and quantize
         out = out.detach().cpu()
-        out_max = torch.max(out)
+        out_max = torch.amax(out, dim=(1, 2, 3), keepdim=True)  # per image
         out_tmp = copy.deepcopy(torch.div(out, out_max))
 
         # quantize
@@ -209,10 +196,11 @@ class SemanticNN(nn.Module):
         out = img2bin(out)
         return out
 
+    @LDPC.instrument.timed()
     def dec(self, x):
         # convert bit streams to img
         out = bin2img(x)
-        out = out.reshape([batch_size, 16, 23, 23])  # recover image from bit stream
+        out = out.reshape([x.shape[0], 16, 23, 23])  # recover image from bit stream
 
         out = out.to(device)
 
@@ -222,7 +210,7 @@ class SemanticNN(nn.Module):
 
         # scale and quantize
         out = out.detach().cpu()
-        out_max = torch.max(out)
+        out_max = torch.amax(out, dim=(1, 2, 3), keepdim=True)  # per image
         out_tmp = copy.deepcopy(torch.div(out, out_max))
 
         # quantize
@@ -238,20 +226,123 @@ class SemanticNN(nn.Module):
         return x
 
 
-def sf_relay(x, snr1, rho):
-    n = 900  # LDPC codeword length
-    snr2 = 20
-    d_v = 2  # Number of parity-check equations including a certain bit
-    d_c = 3  # Number of bits in the same parity-check equation
+def _per_image(v):
+    # scalar, or one value per image as a (B, 1) column of the (B, bits) streams
+    if np.ndim(v) == 0:
+        return v
+    return torch.as_tensor(np.reshape(v, (-1, 1)), dtype=torch.float32)
+
+
+_worker_shared = None  # code attached from shared memory in a worker process
+_worker_code = None
+
+
+def relay_code():
+    # LDPC code of both links, built once and loaded from the code cache
+    if _worker_code is not None:
+        return _worker_code
+    G = LDPC.get_coding_matrix(ldpc_n, ldpc_dv, ldpc_dc, seed=ldpc_seed, systematic=True)  # CSR, converted once
+    decoder = LDPC.get_decoder(ldpc_n, ldpc_dv, ldpc_dc, seed=ldpc_seed, systematic=True)
+    return G, decoder
+
+
+def relay_rounds(Lc1, DEC_para1, layout1, Lc2, DEC_para2, layout2, snr1, rho, rounds=n_rounds):
+    """Joint decoding rounds of the relay, one image per column of Lc1 / Lc2.
+
+    snr1 and rho are scalars or one value per column, so that several
+    operating points can be decoded together. Yields a dict per round with
+    the decoded streams X1_hat, X1s_hat (independent decoding), the
+    semantic image X2, the exchanged LLR La1, La2, ex_info2 and the
+    per-column maxima Lp1_max, Lp2_max before limiting.
+    """
+    b = Lc1.shape[1]
+    Lp1 = copy.deepcopy(Lc1)
+    Lp2 = copy.deepcopy(Lc2)
+    Lp1s = copy.deepcopy(Lc1)
+    Lp2s = copy.deepcopy(Lc2)
+
+    La1 = None  # torch.zeros([1, Lp1.shape[0]])  # np.zeros([1, Lp1.shape[1]])
+    La2 = None  # torch.zeros([1, Lp2.shape[0]])  # np.zeros([1, Lp2.shape[1]])
+
+    for i in range(rounds):  # joint dec
+        with LDPC.instrument.timer('joint round', round=i):
+            # joint decoding
+            Lp1 = LDPC_dec_LLR(Lp1, DEC_para1, layout1, La=La1, maxiter=1)
+            Lp2 = LDPC_dec_LLR(Lp2, DEC_para2, layout2, La=La2, maxiter=1)
+            # independent decoding
+            Lp1s = LDPC_dec_LLR(Lp1s, DEC_para1, layout1, La=None, maxiter=1)
+            Lp2s = LDPC_dec_LLR(Lp2s, DEC_para2, layout2, La=None, maxiter=1)
+
+            X1_hat = hard_decision(Lp1, layout1)  # hard decision
+            X1s_hat = hard_decision(Lp1s, layout1)  # hard decision
+
+            X2 = hard_decision(Lp2, layout2)
+            X2 = semantic_coder.dec(X2)
+
+            if La1 is None:
+                ex_info1 = Lp1
+            else:
+                ex_info1 = calc_exinfo(torch.tensor(Lp1), La1.t(), layout1)
+
+            ex_info2 = (img2bin(X2) * -2 + 1)  # LLR mapping 0->1, 1->-1
 
+            Lp1_max = Lp1.max(axis=0)  # per image
+            Lp2_max = Lp2.max(axis=0)
+
+            La1 = LDPC.fc(ex_info2, _per_image(rho / (i + 1)), LLR_limit=50)  # exchange ex_info
+            La1 = scale_8bit_weight(La1) * _per_image(
+                    10 ** ((-5 + i * (1 - rho) * 2 - snr1 / 2 - 3) / 10))  # SNR1 smaller，X2 should give more ex_info to X1
+            ex_fc1 = LDPC.fc(ex_info1, rho / (i + 1), LLR_limit=50)  # exchange ex_info
+
+            ex_fc1 = hard_decision(ex_fc1, layout1)  # hard decision
+            ex_fc1 = bin2img(ex_fc1).reshape([b, 3, 96, 96])
+            La2 = scale_8bit_weight(semantic_coder.enc(ex_fc1) * -2 + 1) * _per_image(
+                    10 ** ((rho * (
+                    rho * 1000 + 10 * snr1) + 8 * i) / 10))  # LLR mapping 0->1, 1->-1, SNR1 and rho are larger，give more ex_info to X2
+
+        yield {'X1_hat': X1_hat, 'X1s_hat': X1s_hat, 'X2': X2, 'ex_info2': ex_info2,
+               'La1': La1, 'La2': La2, 'Lp1_max': Lp1_max, 'Lp2_max': Lp2_max}
+
+        Lp1 = Lp1 * (200 / np.maximum(Lp1_max, 200))  # limit the LLR of each image
+        Lp2 = Lp2 * (300 / np.maximum(Lp2_max, 300))
+
+
+@contextlib.contextmanager
+def _profiled(name):
+    # JSON profile and Chrome trace of a run, written to profile_dir if set
+    if profile_dir is None:
+        yield
+        return
+    with LDPC.instrument.Profile(name) as profile:
+        yield
+    os.makedirs(profile_dir, exist_ok=True)
+    profile.save(os.path.join(profile_dir, name + '.json'))
+    profile.save_chrome_trace(os.path.join(profile_dir, name + '.trace.json'))
+
+
+def sf_relay(x, snr1, rho, image=None):
+    """Relay a batch of images at the operating point (snr1, rho).
+
+    The metrics of every joint decoding round are buffered in the results
+    sink of `results_path` (see `relay_sink`), with the epoch `e`, the image
+    id `image` (-1 if None) and a run id of their own, so that the rows of
+    repeated calls at the same point are all kept; `export_csv(results_path,
+    csv_path, snr=snr1, rho=rho)` writes them as a CSV table.
+    """
+    with _profiled(f'sf_relay-snr{snr1}-rho{rho:g}-epoch{e}'):
+        return _sf_relay(x, snr1, rho, -1 if image is None else image, _new_run())
+
+
+def _sf_relay(x, snr1, rho, image, run):
     imgdir = f'images/snr{snr1}-rho{rho:g}'
     os.makedirs(imgdir, exist_ok=True)
+    b = x.shape[0]  # batch of images, relayed together
 
     X1 = img2bin(x)  # original bit stream
     E = rng.binomial(1, rho, X1.shape)
     X2_bits = (X1 + E) % 2  # simulate messages
 
-    X2_img = bin2img(X2_bits).reshape([batch_size, 3, 96, 96]).to(device)  # recover image from bit stream
+    X2_img = bin2img(X2_bits).reshape([b, 3, 96, 96]).to(device)  # recover image from bit stream
     X2 = semantic_coder.enc(X2_img)
 
     n2 = X2.size()[1]
@@ -260,52 +351,34 @@ def sf_relay(x, snr1, rho):
 
     n1 = X1.size()[1]
 
-    H, G = LDPC.make_ldpc(n, d_v, d_c, seed=seed, systematic=True, sparse=True)
+    G, decoder = relay_code()
     n, k = G.shape  # n: code length, k: information bits length
 
-    g1 = int(np.ceil(n1 / k))  # divide bit sequence into groups for encoding
-    g2 = int(np.ceil(n2 / k))  # divide bit sequence into groups for encoding
+    # divide bit sequences into groups for encoding, info bit positions
+    layout1 = LDPC.FrameLayout(n1, n, k)
+    layout2 = LDPC.FrameLayout(n2, n, k)
 
-    C1 = LDPC_enc(G, X1)
-    C2 = LDPC_enc(G, X2)
+    C1 = LDPC_enc(G, X1, layout1)
+    C2 = LDPC_enc(G, X2, layout2)
 
     # received signals with noise
-    Y1 = LDPC.add_gaussian_noise(C1, snr1, seed=seed)
-    Y2 = LDPC.add_gaussian_noise(C2, snr2, seed=seed)
+    with LDPC.instrument.timer('noise'):
+        Y1 = LDPC.add_gaussian_noise(C1, snr1, seed=seed)
+        Y2 = LDPC.add_gaussian_noise(C2, snr2, seed=seed)
 
-    Lc1, DEC_para1 = LDPC_dec_init(H, Y1, snr1, g1, n)
-    Lc2, DEC_para2 = LDPC_dec_init(H, Y2, snr2, g2, n)
+    Lc1, DEC_para1 = LDPC_dec_init(decoder, Y1, snr1)
+    Lc2, DEC_para2 = LDPC_dec_init(decoder, Y2, snr2)
 
-    Lp1 = copy.deepcopy(Lc1)
-    Lp2 = copy.deepcopy(Lc2)
-    Lp1s = copy.deepcopy(Lc1)
-    Lp2s = copy.deepcopy(Lc2)
-
-    La1 = None  # torch.zeros([1, Lp1.shape[0]])  # np.zeros([1, Lp1.shape[1]])
-    La2 = None  # torch.zeros([1, Lp2.shape[0]])  # np.zeros([1, Lp2.shape[1]])
-
-    for i in range(8):  # joint dec
+    for i, r in enumerate(relay_rounds(Lc1, DEC_para1, layout1, Lc2, DEC_para2, layout2, snr1, rho)):
         print(f'--------------------- LDPC joint dec [{i:d}] -----------------------------')
-        # joint decoding
-        Lp1 = LDPC_dec_LLR(Lp1, DEC_para1, g1, n1, n, k, La=La1, maxiter=1)
-        Lp2 = LDPC_dec_LLR(Lp2, DEC_para2, g2, n2, n, k, La=La2, maxiter=1)
-        # independent decoding
-        Lp1s = LDPC_dec_LLR(Lp1s, DEC_para1, g1, n1, n, k, La=None, maxiter=1)
-        Lp2s = LDPC_dec_LLR(Lp2s, DEC_para2, g2, n2, n, k, La=None, maxiter=1)
-
-        X1_hat = hard_decision(Lp1, g1, n1, n, k)  # hard decision
-        X1s_hat = hard_decision(Lp1s, g1, n1, n, k)  # hard decision
+        X1_hat = r['X1_hat']
         j1 = LDPC.BER(X1, X1_hat)
-        s1 = LDPC.BER(X1, X1s_hat)
+        s1 = LDPC.BER(X1, r['X1s_hat'])
         print(f'BER s: {s1 :g}, j: {j1 :g}')
 
-        X2 = hard_decision(Lp2, g2, n2, n, k)
-
-        X2 = semantic_coder.dec(X2)
-
-        X2_data = to_data(X2.reshape([batch_size, 3, 96, 96]))
-        X1_data = to_data(bin2img(X1_hat).reshape([batch_size, 3, 96, 96]))
-        X1s_data = to_data(bin2img(X1s_hat).reshape([batch_size, 3, 96, 96]))
+        X2_data = to_data(r['X2'].reshape([b, 3, 96, 96]))
+        X1_data = to_data(bin2img(X1_hat).reshape([b, 3, 96, 96]))
+        X1s_data = to_data(bin2img(r['X1s_hat']).reshape([b, 3, 96, 96]))
 
         merged = merge_images(to_data(x), X2_data)
         save_img(merged, f'{imgdir:s}/origin-semantic-{e:d}-{i:d}.png')
@@ -321,42 +394,552 @@ def sf_relay(x, snr1, rho):
         save_img(merged,
                  os.path.join('%s/%d-%d-BER=%.9f-ED1s=%.9f-ED1=%.9f.png' % (imgdir, e, i, j1, ed1s, ed1)))
 
-        if La1 is None:
-            ex_info1 = Lp1
-        else:
-            ex_info1 = calc_exinfo(torch.tensor(Lp1), La1.t(), g1, n1, n, k)
+        Lp1_max = r['Lp1_max'].max()
+        Lp2_max = r['Lp2_max'].max()
+        La1_max = r['La1'].max()
+        La2_max = r['La2'].max()
+        print(
+            f'Max Lp1: {Lp1_max :g}, ex_info2: {r["ex_info2"].max() :g}, La1: {La1_max:g}, Lp2: {Lp2_max :g},La2: {La2_max :g}')
 
-        ex_info2 = (img2bin(X2) * -2 + 1)  # LLR mapping 0->1, 1->-1
+        relay_sink().add([dict(zip(SWEEP_COLUMNS, (e, image, rho, snr1, run, i, s1, j1, ed1s, ed1, ed2, Lp1_max,
+                                                   La1_max, Lp2_max, La2_max)))])
 
-        Lp1_max = Lp1.max()
-        Lp2_max = Lp2.max()
+    return bin2img(X1_hat).reshape([b, 3, 96, 96])
 
-        La1 = LDPC.fc(ex_info2, rho / (i + 1), LLR_limit=50)  # exchange ex_info
-        La1 = scale_8bit_weight(La1) * (
-                10 ** ((-5 + i * (1 - rho) * 2 - snr1 / 2 - 3) / 10))  # SNR1 smaller，X2 should give more ex_info to X1
-        ex_fc1 = LDPC.fc(ex_info1, rho / (i + 1), LLR_limit=50)  # exchange ex_info
 
-        ex_fc1 = hard_decision(ex_fc1, g1, n1, n, k)  # hard decision
-        ex_fc1 = bin2img(ex_fc1).reshape([batch_size, 3, 96, 96])
-        La2 = scale_8bit_weight(semantic_coder.enc(ex_fc1) * -2 + 1) * (
-                10 ** ((rho * (
-                rho * 1000 + 10 * snr1) + 8 * i) / 10))  # LLR mapping 0->1, 1->-1, SNR1 and rho are larger，give more ex_info to X2
-        La1_max = La1.max()
-        La2_max = La2.max()
-        print(
-            f'Max Lp1: {Lp1_max :g}, ex_info2: {ex_info2.max() :g}, La1: {La1_max:g}, Lp2: {Lp2_max :g},La2: {La2_max :g}')
-        if Lp1_max > 200:
-            Lp1 = Lp1 * (200 / Lp1_max)
-        if Lp2_max > 300:
-            Lp2 = Lp2 * (300 / Lp2_max)
-        X1_hat = hard_decision(Lp1, g1, n1, n, k)  # hard decision
+# run: 0 for the points of the sweeps, run once each; an id per sf_relay call
+SWEEP_COLUMNS = ['epoch', 'image', 'rho', 'snr', 'run', 'iter_round', 'BERs', 'BERj', 'EDs', 'EDj', 'ED_semantic',
+                 'Lp1_max', 'La1_max', 'Lp2_max', 'La2_max']
 
-        with open(f'images/snr{snr1:d}-rho{rho:g}.csv', mode='a', newline='') as file:
-            writer = csv.writer(file)
-            data = [e, i, s1, j1, ed1s, ed1, ed2, Lp1_max, La1_max, Lp2_max, La2_max]
-            writer.writerow(data)
 
-    return bin2img(X1_hat).reshape([batch_size, 3, 96, 96])
+# integer columns of the results table, the others are float64
+_INT_COLUMNS = ('epoch', 'image', 'run', 'iter_round')
+_KEY_COLUMNS = ['epoch', 'image', 'rho', 'snr', 'run', 'iter_round']
+_last_run = 0
+_run_lock = threading.Lock()
+
+
+def _new_run():
+    # increasing ids, from the clock so that they also differ between processes
+    global _last_run
+    with _run_lock:
+        _last_run = max(time.time_ns(), _last_run + 1)
+        return _last_run
+
+
+def _chunk_paths(path):
+    return sorted(glob.glob(os.path.join(glob.escape(path), '*.npz')))
+
+
+def _write_chunk(path, table):
+    # written under a hidden temporary name and renamed, readers never see partial chunks
+    name = f'part-{os.getpid():d}-{uuid.uuid4().hex}'
+    tmp = os.path.join(path, f'.{name}.tmp')
+    with open(tmp, mode='wb') as file:
+        np.savez(file, **table)
+    os.replace(tmp, os.path.join(path, name + '.npz'))
+
+
+def _to_table(rows):
+    return {name: np.array([row[name] for row in rows], dtype=np.int64 if name in _INT_COLUMNS else np.float64)
+            for name in SWEEP_COLUMNS}
+
+
+class ResultsSink:
+    """Buffered writer of the rows of a results table to a columnar store.
+
+    The store is a directory of chunks, `.npz` files holding one array per
+    column of `SWEEP_COLUMNS`: the operating point, epoch and round of a row
+    are columns like its metrics. Rows are buffered in memory and written as
+    one chunk every `buffer_rows` rows and on `flush`. Every chunk gets a
+    name of its own, so the sinks of parallel workers write to the same
+    store without any lock, and it is renamed into place once complete.
+
+    Buffered rows are lost if the process is killed before a flush. The sink
+    can be used as a context manager, which flushes it on exit.
+
+    Parameters
+    ----------
+    path: str. Directory of the store, created if needed.
+    buffer_rows: int, default 4096. Number of buffered rows that triggers a
+        flush.
+
+    """
+
+    def __init__(self, path, buffer_rows=4096):
+        if buffer_rows < 1:
+            raise ValueError("buffer_rows must be positive.")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.buffer_rows = buffer_rows
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def add(self, rows):
+        """Buffer rows, dicts with the keys of `SWEEP_COLUMNS`."""
+        with self._lock:
+            self._rows.extend(rows)
+            full = len(self._rows) >= self.buffer_rows
+        if full:
+            self.flush()
+
+    @LDPC.instrument.timed('results flush')
+    def flush(self):
+        """Write the buffered rows as a chunk of the store."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if rows:
+                _write_chunk(self.path, _to_table(rows))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+def read_results(path, **where):
+    """Return the results table of a store as a dict of column arrays.
+
+    Rows are sorted by (epoch, image, rho, snr, run, iter_round) and
+    duplicates of a row key, left by an interrupted `compact_results`, are
+    dropped. Keyword arguments select the rows whose column
+    equals the given value, e.g. `read_results(path, snr=2, rho=0.1)`.
+    """
+    tables = []
+    for fname in _chunk_paths(path):
+        with np.load(fname) as chunk:
+            table = {name: chunk[name] for name in SWEEP_COLUMNS if name in chunk.files}
+        # chunks written before the run column: sweep rows
+        table.setdefault('run', np.zeros(len(table['epoch']), dtype=np.int64))
+        tables.append(table)
+    if not tables:
+        return _to_table([])
+    table = {name: np.concatenate([t[name] for t in tables]) for name in SWEEP_COLUMNS}
+    keep = np.ones(len(table['epoch']), dtype=bool)
+    for name, value in where.items():
+        if name not in table:
+            raise ValueError(f"unknown column {name!r}.")
+        keep &= table[name] == value
+    order = np.lexsort([table[name][keep] for name in reversed(_KEY_COLUMNS)])
+    table = {name: column[keep][order] for name, column in table.items()}
+    keys = np.stack([table[name].astype(np.float64) for name in _KEY_COLUMNS], axis=1)
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+    return {name: column[first] for name, column in table.items()}
+
+
+def export_csv(path, csv_path, **where):
+    """Write the results table of a store, or its rows selected as in
+    `read_results`, as a CSV file with a header of `SWEEP_COLUMNS`."""
+    table = read_results(path, **where)
+    with open(csv_path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(SWEEP_COLUMNS)
+        writer.writerows(zip(*(table[name].tolist() for name in SWEEP_COLUMNS)))
+
+
+def compact_results(path, table=None):
+    """Replace the chunks of a store by a single chunk of its sorted table
+    (or of `table`)."""
+    old = _chunk_paths(path)
+    if table is None:
+        table = read_results(path)
+    if len(table['epoch']):
+        _write_chunk(path, table)
+    # a crash here leaves duplicated rows, which read_results drops
+    for fname in old:
+        os.remove(fname)
+
+
+_relay_sink = None
+
+
+def relay_sink():
+    """Return the results sink of `sf_relay`, writing to `results_path`.
+
+    It is flushed at exit; call its `flush` to write the buffered rows
+    earlier.
+    """
+    global _relay_sink
+    if _relay_sink is None or _relay_sink.path != results_path:
+        if _relay_sink is not None:
+            _relay_sink.flush()
+        else:
+            atexit.register(lambda: _relay_sink.flush())
+        _relay_sink = ResultsSink(results_path)
+    return _relay_sink
+
+
+def _completed_points(path, rounds):
+    """Return the (epoch, image, rho, snr) points of a store with all their rounds.
+
+    The rows of points left with fewer rounds are dropped from the store, so
+    that they are run again from scratch.
+    """
+    table = read_results(path)
+    keys = list(zip(*(table[name].tolist() for name in ('epoch', 'image', 'rho', 'snr'))))
+    counts = collections.Counter(keys)
+    done = {key for key, count in counts.items() if count >= rounds}
+    if len(done) < len(counts):
+        keep = np.array([key in done for key in keys], dtype=bool)
+        compact_results(path, {name: column[keep] for name, column in table.items()})
+    return done
+
+
+def _pending_points(done, epoch, image, snrs, rhos):
+    # SNRs still to run for each rho of an image, rhos without any are left out
+    todo = {}
+    for rho in rhos:
+        rho_snrs = [snr for snr in snrs if (epoch, image, float(rho), float(snr)) not in done]
+        if rho_snrs:
+            todo[rho] = rho_snrs
+    return todo
+
+
+def _relayed_messages(X1, rho):
+    # bits of the relay: X1 flipped with probability rho, then semantic-encoded
+    E = rng.binomial(1, rho, X1.shape)
+    return semantic_coder.enc(bin2img((X1 + E) % 2).reshape([X1.shape[0], 3, 96, 96]).to(device))
+
+
+def _channel(C1, C2, snrs, b):
+    """Return the SNR of each column and the received frames Y1, Y2 of the
+    points of snrs, b point-major columns per point.
+
+    The noise of all the points is drawn in one batch.
+    """
+    s = len(snrs)
+    snr1 = np.repeat(np.asarray(snrs, dtype=float), b)
+    with LDPC.instrument.timer('noise', points=s):
+        Y1 = LDPC.add_gaussian_noise(np.tile(np.asarray(C1), s), snr1, seed=rng)
+        Y2 = LDPC.add_gaussian_noise(np.tile(np.asarray(C2), s), snr2, seed=rng)
+    return snr1, Y1, Y2
+
+
+def _decode_points(Y1, Y2, snr1, rho, layout1, layout2, decoder, rounds):
+    # joint decoding rounds of all the columns of Y1, Y2 together
+    Lc1, DEC_para1 = LDPC_dec_init(decoder, Y1, snr1)
+    Lc2, DEC_para2 = LDPC_dec_init(decoder, Y2, snr2)
+    return relay_rounds(Lc1, DEC_para1, layout1, Lc2, DEC_para2, layout2, snr1, np.full(snr1.size, rho),
+                        rounds)
+
+
+@LDPC.instrument.timed('metrics')
+def _round_rows(r, i, x, X1, snrs, rho, epoch, image, save_images):
+    """Return the table rows of the points of snrs at round i of `relay_rounds`."""
+    s, b = len(snrs), x.shape[0]
+    X1 = X1.repeat(s, 1)
+    x_data = np.tile(to_data(x), (s, 1, 1, 1))
+    shape = [s * b, 3, 96, 96]
+    X2_data = to_data(r['X2'].reshape(shape))
+    X1_data = to_data(bin2img(r['X1_hat']).reshape(shape))
+    X1s_data = to_data(bin2img(r['X1s_hat']).reshape(shape))
+    # per-column metrics, averaged or maximized over the images of a point
+    means = {'BERs': (r['X1s_hat'] != X1).double().mean(dim=1).numpy(),
+             'BERj': (r['X1_hat'] != X1).double().mean(dim=1).numpy(),
+             'EDs': ((x_data - X1s_data) ** 2).mean(axis=(1, 2, 3)),
+             'EDj': ((x_data - X1_data) ** 2).mean(axis=(1, 2, 3)),
+             'ED_semantic': ((x_data - X2_data) ** 2).mean(axis=(1, 2, 3))}
+    maxima = {'Lp1_max': r['Lp1_max'], 'La1_max': r['La1'].amax(dim=1).numpy(),
+              'Lp2_max': r['Lp2_max'], 'La2_max': r['La2'].amax(dim=1).numpy()}
+    rows = []
+    for p, snr in enumerate(snrs):
+        cols = slice(p * b, (p + 1) * b)
+        row = {'epoch': epoch, 'image': image, 'rho': rho, 'snr': snr, 'run': 0, 'iter_round': i}
+        row.update((name, float(v[cols].mean())) for name, v in means.items())
+        row.update((name, float(v[cols].max())) for name, v in maxima.items())
+        rows.append(row)
+        if save_images:
+            imgdir = f'images/snr{snr}-rho{rho:g}'
+            os.makedirs(imgdir, exist_ok=True)
+            save_img(merge_images(x_data[cols], X2_data[cols]),
+                     f'{imgdir:s}/origin-semantic-{epoch:d}-{image:d}-{i:d}.png')
+            save_img(merge_images(X1s_data[cols], X1_data[cols]),
+                     f'{imgdir:s}/{epoch:d}-{image:d}-{i:d}-BER={row["BERj"]:.9f}.png')
+    return rows
+
+
+def _relay_points(x, X1, C1, layout1, C2, layout2, decoder, snrs, rho, rounds, save_images, epoch, image):
+    """Relay a batch of images at the operating points (snr, rho) of snrs.
+
+    The frames C1, C2 are shared by all the points, which are decoded
+    together as blocks of columns. Returns the rows of the results table.
+    """
+    with _profiled(f'sweep-epoch{epoch}-image{image}-rho{rho:g}-snr{snrs[0]}-{snrs[-1]}'):
+        snr1, Y1, Y2 = _channel(C1, C2, snrs, x.shape[0])
+        rows = []
+        for i, r in enumerate(_decode_points(Y1, Y2, snr1, rho, layout1, layout2, decoder, rounds)):
+            rows += _round_rows(r, i, x, X1, snrs, rho, epoch, image, save_images)
+    return rows
+
+
+def sweep(images, snrs, rhos, epoch=0, path='images/sweep', rounds=n_rounds, chunk_size=8,
+          save_images=False):
+    """Relay images at every (snr, rho) operating point of a grid.
+
+    The frames of an image are shared by its operating points: C1 is
+    encoded once per image and C2 once per (image, rho). The noise of up to
+    `chunk_size` SNRs is drawn in one batch and these points are decoded
+    together, one block of columns per point.
+
+    Results go to a tidy table with one row per (epoch, image, rho, snr,
+    iter_round), in the columnar store of a `ResultsSink`: the rows of a
+    chunk of points are buffered when it is done and written in batches.
+    Points already in the store are skipped, so that an interrupted sweep
+    resumes where it stopped; `export_csv` writes the table as CSV.
+
+    Parameters
+    ----------
+    images: iterable of (image_id, x). Integer id and batch (b, 3, 96, 96)
+        of images; the metrics of a point are averaged over the batch.
+    snrs: list of int. SNRs of the first link in decibels.
+    rhos: list of float. Crossover probabilities of the relayed messages.
+    epoch: int. Epoch recorded in the table.
+    path: str. Directory of the results store.
+    rounds: int. Number of joint decoding rounds.
+    chunk_size: int. Maximum number of points decoded together.
+    save_images: boolean, default False. If True, save the merged images of
+        every point and round, as `sf_relay` does.
+
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive.")
+    with ResultsSink(path) as sink:
+        _sweep(images, snrs, rhos, epoch, sink, _completed_points(path, rounds), rounds, chunk_size, save_images)
+
+
+def _sweep(images, snrs, rhos, epoch, sink, done, rounds, chunk_size, save_images):
+    # points of done are skipped
+    G, decoder = relay_code()
+    n, k = G.shape
+    for image, x in images:
+        todo = _pending_points(done, epoch, image, snrs, rhos)
+        if not todo:
+            continue
+        X1 = img2bin(x)
+        layout1 = LDPC.FrameLayout(X1.shape[1], n, k)
+        C1 = LDPC_enc(G, X1, layout1)
+        for rho, rho_snrs in todo.items():
+            X2 = _relayed_messages(X1, rho)
+            layout2 = LDPC.FrameLayout(X2.shape[1], n, k)
+            C2 = LDPC_enc(G, X2, layout2)
+            for start in range(0, len(rho_snrs), chunk_size):
+                print(f'===================== image {image:d}, rho={rho:g}, '
+                      f'snr={rho_snrs[start:start + chunk_size]} ====================')
+                sink.add(_relay_points(x, X1, C1, layout1, C2, layout2, decoder,
+                                       rho_snrs[start:start + chunk_size], rho, rounds, save_images, epoch, image))
+
+
+_END = object()  # end of the stream of a pipeline queue
+
+
+def _run_pipeline(source, stages, maxsize):
+    """Run the items of source through a chain of stages on their own threads.
+
+    stages is a list of (fn, n_threads); fn(item) returns an iterable of
+    items for the next stage, or None for the last one. Stages are connected
+    by queues of at most maxsize items and a stage blocks while its output
+    queue is full (backpressure). The first exception of a stage stops the
+    pipeline and is raised.
+    """
+    queues = [queue.Queue(maxsize) for _ in stages]
+    failed = threading.Event()
+    errors = []
+    lock = threading.Lock()
+
+    def put(q, item):
+        # blocking put, given up when the pipeline fails
+        while not failed.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def work(fn, inbox, outbox, running):
+        while True:
+            item = inbox.get()
+            if item is _END:
+                inbox.put(_END)  # stops the other threads of the stage
+                with lock:
+                    running[0] -= 1
+                    last = running[0] == 0
+                if last and outbox is not None:
+                    outbox.put(_END)
+                return
+            if failed.is_set():
+                continue  # drain the queue
+            try:
+                for out in fn(item) or ():
+                    if not put(outbox, out):
+                        break
+            except BaseException as exc:
+                errors.append(exc)
+                failed.set()
+
+    threads = []
+    for j, (fn, n_threads) in enumerate(stages):
+        outbox = queues[j + 1] if j + 1 < len(stages) else None
+        running = [n_threads]
+        for _ in range(n_threads):
+            thread = threading.Thread(target=work, args=(fn, queues[j], outbox, running), daemon=True)
+            thread.start()
+            threads.append(thread)
+    try:
+        for item in source:
+            if not put(queues[0], item):
+                break
+    except BaseException:
+        failed.set()
+        raise
+    finally:
+        queues[0].put(_END)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+
+def pipeline_sweep(images, snrs, rhos, epoch=0, path='images/sweep', rounds=n_rounds, chunk_size=8,
+                   save_images=False, semantic_threads=1, ldpc_threads=1, maxsize=2):
+    """Run `sweep` as a streaming pipeline of concurrent stages.
+
+    The images of the loader go through semantic encoding of the relayed
+    messages (torch), LDPC encoding and channel, joint decoding and the
+    metrics / results table sink, each stage on its own threads and
+    connected to the next by a queue of at most `maxsize` items. The numba
+    solvers release the GIL, so the LDPC work of a chunk of points overlaps
+    the neural network work of the next images, and a stage waits while its
+    output queue is full, which bounds the memory in flight. Each LDPC
+    thread decodes with its own copy of the decoder.
+
+    Parameters
+    ----------
+    images, snrs, rhos, epoch, path, rounds, chunk_size, save_images: see
+        `sweep`.
+    semantic_threads: int. Threads of the semantic encoding stage.
+    ldpc_threads: int. Threads of each of the LDPC encoding / channel and
+        joint decoding stages.
+    maxsize: int. Capacity of the queues between stages.
+
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive.")
+    with ResultsSink(path) as results:
+        _pipeline_sweep(images, snrs, rhos, epoch, results, rounds, chunk_size, save_images, semantic_threads,
+                        ldpc_threads, maxsize)
+
+
+def _pipeline_sweep(images, snrs, rhos, epoch, results, rounds, chunk_size, save_images, semantic_threads,
+                    ldpc_threads, maxsize):
+    done = _completed_points(results.path, rounds)
+    G, decoder = relay_code()
+    n, k = G.shape
+    local = threading.local()
+    pending = {}
+
+    def semantic_encode(item):
+        image, x = item
+        todo = _pending_points(done, epoch, image, snrs, rhos)
+        if todo:
+            X1 = img2bin(x)
+            yield image, x, X1, {rho: _relayed_messages(X1, rho) for rho in todo}, todo
+
+    def channel(item):
+        image, x, X1, X2, todo = item
+        layout1 = LDPC.FrameLayout(X1.shape[1], n, k)
+        C1 = LDPC_enc(G, X1, layout1)
+        for rho, rho_snrs in todo.items():
+            layout2 = LDPC.FrameLayout(X2[rho].shape[1], n, k)
+            C2 = LDPC_enc(G, X2[rho], layout2)
+            for start in range(0, len(rho_snrs), chunk_size):
+                chunk = {'image': image, 'x': x, 'X1': X1, 'rho': rho, 'snrs': rho_snrs[start:start + chunk_size],
+                         'layout1': layout1, 'layout2': layout2}
+                chunk['snr1'], chunk['Y1'], chunk['Y2'] = _channel(C1, C2, chunk['snrs'], x.shape[0])
+                yield chunk
+
+    def joint_decode(chunk):
+        if not hasattr(local, 'decoder'):
+            local.decoder = decoder.configure()  # message buffers of this thread
+        Y1, Y2 = chunk.pop('Y1'), chunk.pop('Y2')
+        for i, r in enumerate(_decode_points(Y1, Y2, chunk['snr1'], chunk['rho'], chunk['layout1'],
+                                             chunk['layout2'], local.decoder, rounds)):
+            yield chunk, i, r
+
+    def sink(item):
+        chunk, i, r = item
+        rows = pending.setdefault(id(chunk), [])
+        rows += _round_rows(r, i, chunk['x'], chunk['X1'], chunk['snrs'], chunk['rho'], epoch, chunk['image'],
+                            save_images)
+        if i == rounds - 1:
+            results.add(pending.pop(id(chunk)))
+
+    with _profiled(f'pipeline-epoch{epoch}'):
+        _run_pipeline(images, [(semantic_encode, semantic_threads), (channel, ldpc_threads),
+                               (joint_decode, ldpc_threads), (sink, 1)], maxsize)
+
+
+def _init_worker(spec, state_dict, profiles):
+    global _worker_shared, _worker_code, profile_dir
+    profile_dir = profiles
+    torch.set_num_threads(1)  # one core per worker
+    semantic_coder.load_state_dict(state_dict)
+    _worker_shared = LDPC.SharedCode.attach(spec)
+    _worker_code = _worker_shared.G, _worker_shared.decoder()
+
+
+def _sweep_item(image, x, snrs, rho, epoch, path, rounds, save_images, item_seed):
+    global rng
+    rng = np.random.RandomState(item_seed)
+    # the parent skipped the completed points, the store is not read here
+    with ResultsSink(path) as sink:
+        _sweep([(image, x)], snrs, [rho], epoch, sink, set(), rounds, len(snrs), save_images)
+
+
+def parallel_sweep(images, snrs, rhos, epoch=0, path='images/sweep', n_workers=None, rounds=n_rounds,
+                   chunk_size=8, save_images=False, seed=None):
+    """Run `sweep` on a pool of worker processes.
+
+    Work items of one image, one rho and up to `chunk_size` SNRs are spread
+    over the workers. The LDPC code and the decoder edge indices are placed
+    once in shared memory and attached without copy by the workers. Each
+    worker writes the rows of its items as chunks of its own in the store
+    of `path`, without locking, and the chunks are compacted into one at
+    the end. Interrupted sweeps resume as with `sweep`.
+
+    Parameters
+    ----------
+    images, snrs, rhos, epoch, path, rounds, chunk_size, save_images: see
+        `sweep`.
+    n_workers: int, default None. Number of worker processes; if None, one
+        per core.
+    seed: int, default None. Seed of the messages and noise of the work
+        items; if None, each item draws them from fresh entropy.
+
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive.")
+    os.makedirs(path, exist_ok=True)
+    done = _completed_points(path, rounds)
+    G, decoder = relay_code()
+    # spawned workers, torch is not fork-safe once its thread pool runs
+    context = multiprocessing.get_context('spawn')
+    with LDPC.SharedCode(decoder.H, G, decoder) as shared, concurrent.futures.ProcessPoolExecutor(
+            n_workers, mp_context=context, initializer=_init_worker,
+            initargs=(shared.spec, semantic_coder.state_dict(), profile_dir)) as pool:
+        futures = []
+        for image, x in images:
+            for r, rho in enumerate(rhos):
+                rho_snrs = [snr for snr in snrs if (epoch, image, float(rho), float(snr)) not in done]
+                for start in range(0, len(rho_snrs), chunk_size):
+                    item_seed = None if seed is None else [seed, epoch, image, r, start]
+                    futures.append(pool.submit(_sweep_item, image, x.cpu(), rho_snrs[start:start + chunk_size], rho,
+                                               epoch, path, rounds, save_images, item_seed))
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+    compact_results(path)
 
 
 semantic_coder = SemanticNN()
@@ -365,33 +948,20 @@ if os.path.exists(file_path):
     semantic_coder.load_state_dict(torch.load(file_path))
 semantic_coder.to(device)
 
-# load data
-train_set = datasets.CIFAR10('./data', train=True, transform=data_tf, download=True)
-train_data = torch.utils.data.DataLoader(train_set, batch_size=batch_size, shuffle=True)
-test_set = datasets.CIFAR10('./data', train=False, transform=data_tf, download=True)
-test_data = torch.utils.data.DataLoader(test_set, batch_size=batch_size, shuffle=False)
-
-for e in range(epoch_len):
-    counter = 0
-    for im, _ in train_data:
-        print('Epoch %d-%d:' % (e, counter))
-        im = Variable(im)
-        im = im.to(device)
-
-        for rho in [0.05, 0.15, 0.35, 0]:
-            for snr1 in range(-5, 10):
-                print(f'===================== rho={rho:g}, snr={snr1:d} ====================')
-                os.makedirs('images/', exist_ok=True)
-                fname = f'images/snr{snr1:d}-rho{rho:g}.csv'
-                if not os.path.exists(fname):
-                    with open(fname, mode='a', newline='') as file:
-                        writer = csv.writer(file)
-                        data = ['epoch', 'iter_round', 'BERs', 'BERj', 'EDs', 'EDj', 'ED_semantic', 'Lp1_max',
-                                'La1_max', 'Lp2_max', 'La2_max']
-                        writer.writerow(data)
-
-                sf_relay(copy.deepcopy(im), snr1, rho)
-
-        counter += 1
-        if counter >= 32:
-            break
+if __name__ == '__main__':
+    # load data
+    train_set = datasets.CIFAR10('./data', train=True, transform=data_tf, download=True)
+    test_set = datasets.CIFAR10('./data', train=False, transform=data_tf, download=True)
+    test_data = torch.utils.data.DataLoader(test_set, batch_size=batch_size, shuffle=False)
+
+    for e in range(epoch_len):
+        # shuffled with the epoch as seed, so that a resumed sweep sees the same images
+        train_data = torch.utils.data.DataLoader(train_set, batch_size=batch_size, shuffle=True,
+                                                 generator=torch.Generator().manual_seed(e))
+        images = ((counter, im.to(device)) for counter, (im, _) in
+                  itertools.islice(enumerate(train_data), images_per_epoch))
+        if n_workers == 1:
+            pipeline_sweep(images, range(-5, 10), [0.05, 0.15, 0.35, 0], epoch=e, save_images=save_images)
+        else:
+            parallel_sweep(images, range(-5, 10), [0.05, 0.15, 0.35, 0], epoch=e, n_workers=n_workers,
+                           save_images=save_images)
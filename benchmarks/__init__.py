@@ -0,0 +1,12 @@
+"""Benchmarks of the LDPC codes and of the semantic-forward relay.
+
+Run ``python -m benchmarks run -o results.json`` from the repository root,
+and ``python -m benchmarks compare baseline.json results.json`` to flag the
+cases that got slower.
+"""
+from .runner import (Case, run_case, run, environment, save, load, compare,
+                     print_comparison)
+from .cases import DEGREE_PROFILES, get_cases
+
+__all__ = ['Case', 'run_case', 'run', 'environment', 'save', 'load',
+           'compare', 'print_comparison', 'DEGREE_PROFILES', 'get_cases']
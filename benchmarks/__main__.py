@@ -0,0 +1,54 @@
+"""Command line interface of the benchmarks: python -m benchmarks -h."""
+import argparse
+import sys
+
+from .cases import get_cases
+from .runner import compare, load, print_comparison, run, save
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("-o", "--output", help="JSON file of the report")
+    run_parser.add_argument("--profile", choices=["quick", "full"],
+                            default="quick")
+    run_parser.add_argument("-k", "--filter", dest="pattern",
+                            help="only run the cases matching this regex")
+    run_parser.add_argument("--repeat", type=int, default=10)
+    run_parser.add_argument("--warmup", type=int, default=1)
+    run_parser.add_argument("--no-memory", dest="memory",
+                            action="store_false",
+                            help="do not measure the peak traced memory")
+    run_parser.add_argument("--baseline",
+                            help="report to compare the results with")
+    run_parser.add_argument("--threshold", type=float, default=0.1)
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare a report with a baseline report")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        report = run(get_cases(args.profile), repeat=args.repeat,
+                     warmup=args.warmup, memory=args.memory,
+                     pattern=args.pattern)
+        if args.output:
+            save(report, args.output)
+        if args.baseline is None:
+            return 0
+        baseline = load(args.baseline)
+    else:
+        baseline, report = load(args.baseline), load(args.current)
+
+    rows = compare(baseline, report, threshold=args.threshold)
+    print_comparison(rows)
+    # exit status 1 if any case got slower
+    return int(any(row["status"] == "slower" for row in rows))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""Benchmark cases of the LDPC codes and of the semantic-forward relay.
+
+`get_cases("quick")` is a small set for a regression check in a few minutes;
+`get_cases("full")` sweeps code lengths from 900 to 64k bits, degree
+profiles, batch sizes, SNRs and thread counts.
+"""
+import numpy as np
+from numba import config
+
+import LDPC
+
+from .runner import Case
+
+# degree profiles of the parity-check matrices: (d_v, d_c) of a regular code
+# or {degree: fraction} of the bits of an irregular code with rate 1 / 2
+DEGREE_PROFILES = {"regular-2-3": (2, 3), "regular-3-6": (3, 6),
+                   "irregular": {2: 0.5, 3: 0.3, 8: 0.2}}
+
+_seed = 0
+
+
+def _parity_check(n, profile):
+    degrees = DEGREE_PROFILES[profile]
+    if isinstance(degrees, dict):
+        return LDPC.irregular_parity_check_matrix(n, n // 2, degrees,
+                                                  seed=_seed, peg=True,
+                                                  max_depth=3)
+    d_v, d_c = degrees
+    return LDPC.parity_check_matrix(n, d_v, d_c, seed=_seed, sparse=True)
+
+
+def _code(n, profile):
+    # regular codes with a coding matrix, from the code cache
+    d_v, d_c = DEGREE_PROFILES[profile]
+    return LDPC.get_ldpc(n, d_v, d_c, seed=_seed, systematic=True)
+
+
+def parity_check_setup(n, profile):
+    H = _parity_check(n, profile)
+    return lambda: _parity_check(n, profile), {"edges": H.nnz}
+
+
+def make_ldpc_setup(n, profile):
+    d_v, d_c = DEGREE_PROFILES[profile]
+
+    def fn():
+        return LDPC.make_ldpc(n, d_v, d_c, systematic=True, sparse=True,
+                              seed=_seed)
+    return fn, {"bits": n}
+
+
+def encode_setup(n, profile, batch, snr):
+    H, G = _code(n, profile)
+    k = G.shape[1]
+    v = np.random.RandomState(_seed).randint(2, size=(k, batch))
+    return (lambda: LDPC.encode(G, v, snr, seed=_seed),
+            {"codewords": batch, "info_bits": batch * k})
+
+
+def encode_stream_setup(n, profile, batch, snr):
+    # batched systematic path of the relay, coding matrix in CSR form
+    d_v, d_c = DEGREE_PROFILES[profile]
+    G = LDPC.get_coding_matrix(n, d_v, d_c, seed=_seed, systematic=True)
+    k = G.shape[1]
+    bits = np.random.RandomState(_seed).randint(2, size=batch * k)
+    return (lambda: LDPC.encode_stream(G, bits, snr, seed=_seed,
+                                       systematic=True),
+            {"codewords": batch, "info_bits": batch * k})
+
+
+def _received(H, batch, snr):
+    # noisy all-zero codewords, valid for any H without its coding matrix
+    m, n = H.shape
+    y = LDPC.add_gaussian_noise(np.ones((n, batch)), snr, seed=_seed)
+    return y, n - m
+
+
+def decode_llr_setup(n, profile, batch, snr, algorithm, schedule, n_threads,
+                     maxiter=10):
+    H = _parity_check(n, profile)
+    y, k = _received(H, batch, snr)
+    decoder = LDPC.LDPCDecoder(H, algorithm=algorithm, schedule=schedule,
+                               n_threads=n_threads)
+    Lc = decoder.init_llr(y, snr)
+    return (lambda: decoder.decode_llr(Lc, maxiter=maxiter),
+            {"codewords": batch, "info_bits": batch * k})
+
+
+def decode_setup(n, profile, batch, snr, maxiter=10):
+    # the functional API, decoder set up on every call
+    H = _parity_check(n, profile)
+    y, k = _received(H, batch, snr)
+    return (lambda: LDPC.decode(H, y, snr, maxiter=maxiter),
+            {"codewords": batch, "info_bits": batch * k})
+
+
+def fc_setup(size, backend):
+    LLR = np.random.RandomState(_seed).randn(size).astype(np.float32) * 20
+    if backend == "torch":
+        import torch
+        LLR = torch.from_numpy(LLR)
+    if backend == "numba":
+        return lambda: LDPC.fc_numba(LLR.copy(), 0.1), {"llr": size}
+    return lambda: LDPC.fc(LLR, 0.1), {"llr": size}
+
+
+def rgb2bin_setup(size):
+    img = np.random.RandomState(_seed).randint(256, size=(size, size, 3),
+                                               dtype=np.uint8)
+    return lambda: LDPC.utils_img.rgb2bin(img), {"pixels": size * size}
+
+
+def _relay_module():
+    import Semantic_Forward
+    return Semantic_Forward
+
+
+def img2bin_setup(batch):
+    import torch
+    sf = _relay_module()
+    x = torch.rand(batch, 3, 96, 96, generator=torch.Generator().manual_seed(
+        _seed)) * 2 - 1
+    return lambda: sf.img2bin(x), {"images": batch}
+
+
+def bin2img_setup(batch):
+    import torch
+    sf = _relay_module()
+    x = torch.rand(batch, 3, 96, 96, generator=torch.Generator().manual_seed(
+        _seed)) * 2 - 1
+    bits = sf.img2bin(x)
+    return lambda: sf.bin2img(bits), {"images": batch}
+
+
+def semantic_enc_setup(batch):
+    import torch
+    sf = _relay_module()
+    x = torch.rand(batch, 3, 96, 96, generator=torch.Generator().manual_seed(
+        _seed)) * 2 - 1
+    return lambda: sf.semantic_coder.enc(x), {"images": batch}
+
+
+def semantic_dec_setup(batch):
+    import torch
+    sf = _relay_module()
+    x = torch.rand(batch, 3, 96, 96, generator=torch.Generator().manual_seed(
+        _seed)) * 2 - 1
+    bits = sf.semantic_coder.enc(x)
+    return lambda: sf.semantic_coder.dec(bits), {"images": batch}
+
+
+def _axes(name, setup, reference, **axes):
+    """Return the cases of setup at the reference parameters and varying one
+    axis at a time over its values."""
+    cases = {}
+    for case in [Case(name, setup, **reference)] + [
+            Case(name, setup, **dict(reference, **{key: value}))
+            for key, values in axes.items() for value in values]:
+        cases.setdefault(case.id, case)
+    return list(cases.values())
+
+
+def get_cases(profile="quick"):
+    """Return the benchmark cases of a profile, "quick" or "full".
+
+    Each benchmark is run at a reference point and, in the full profile,
+    along one parameter axis at a time: code length (900 to 64k bits),
+    degree profile, batch size, SNR, algorithm, schedule and thread count.
+    """
+    if profile not in ("quick", "full"):
+        raise ValueError("profile must be 'quick' or 'full', got %r."
+                         % profile)
+    full = profile == "full"
+    threads = [None]
+    if config.NUMBA_NUM_THREADS > 1:
+        threads.append(config.NUMBA_NUM_THREADS)
+
+    def axes(**values):
+        return values if full else {}
+
+    code = {"n": 4002, "profile": "regular-2-3"}
+    cases = []
+    cases += _axes("parity_check_matrix", parity_check_setup, code,
+                   **axes(n=[900, 16002, 64002],
+                          profile=list(DEGREE_PROFILES)))
+    # dense Gauss-Jordan reductions: coding matrices of the smaller codes,
+    # also used by the encode cases
+    cases += _axes("make_ldpc", make_ldpc_setup, code,
+                   **axes(n=[900], profile=["regular-3-6"]))
+    cases += _axes("encode", encode_setup, dict(code, batch=64, snr=2),
+                   **axes(n=[900], batch=[1, 256]))
+    cases += _axes("encode_stream", encode_stream_setup,
+                   dict(code, batch=64, snr=2),
+                   **axes(n=[900], batch=[1, 256]))
+    reference = dict(code, batch=64, snr=2, algorithm="normalized-min-sum",
+                     schedule="flooding", n_threads=None)
+    cases += _axes("decode_llr", decode_llr_setup, reference,
+                   n=[900] + ([16002, 64002] if full else []),
+                   **axes(profile=list(DEGREE_PROFILES), batch=[1, 256],
+                          snr=[0, 4], algorithm=["sum-product", "min-sum"],
+                          schedule=["layered"], n_threads=threads[1:]))
+    cases += _axes("decode", decode_setup, dict(code, batch=64, snr=2))
+    cases += _axes("fc", fc_setup, {"size": 221184, "backend": "numpy"},
+                   backend=["torch", "numba"])
+    cases += _axes("rgb2bin", rgb2bin_setup, {"size": 96},
+                   **axes(size=[512]))
+    for name, setup in [("img2bin", img2bin_setup),
+                        ("bin2img", bin2img_setup),
+                        ("semantic_enc", semantic_enc_setup),
+                        ("semantic_dec", semantic_dec_setup)]:
+        cases += _axes(name, setup, {"batch": 1}, **axes(batch=[16]))
+    return cases
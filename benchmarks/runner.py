@@ -0,0 +1,226 @@
+"""Timing, reports and baseline comparison of the benchmark cases."""
+import json
+import os
+import platform
+import re
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+
+class Case:
+    """A benchmark case: a setup building the inputs and the timed call.
+
+    Parameters
+    ----------
+    name: str. Name of the benchmark.
+    setup: callable. setup(**params) returns (fn, work), where fn() is the
+        call to time and work a dict of the units processed by one call,
+        e.g. {"codewords": 64, "info_bits": 64 * k}, reported per second.
+    params: keyword arguments of setup, recorded in the results.
+
+    """
+
+    def __init__(self, name, setup, **params):
+        self.name = name
+        self.setup = setup
+        self.params = params
+
+    @property
+    def id(self):
+        """Unique name of the case, used to match results to a baseline."""
+        return "%s[%s]" % (self.name, ",".join(
+            "%s=%s" % item for item in self.params.items()))
+
+    def __repr__(self):
+        return "Case(%s)" % self.id
+
+
+def run_case(case, repeat=10, warmup=1, memory=True):
+    """Time a case.
+
+    Parameters
+    ----------
+    case: Case. Benchmark to run.
+    repeat: int. Number of timed calls.
+    warmup: int. Untimed calls first (e.g. to compile the numba kernels).
+    memory: boolean, default True. If True, one more call is traced to
+        measure the peak of its Python and numpy allocations.
+
+    Returns
+    -------
+    result: dict with keys "id", "name", "params", "repeat", "mean_s",
+        "min_s", "p50_s", "p90_s", "p99_s" (call latencies in seconds),
+        "<unit>_per_s" for each unit of work (at the median latency) and
+        "peak_traced_bytes", the peak of the Python and numpy allocations
+        during one call (tracemalloc; None if not measured). Memory
+        allocated inside the numba kernels or by torch is not seen by
+        tracemalloc and not counted, so this is a lower bound.
+
+    """
+    if repeat < 1:
+        raise ValueError("repeat must be positive.")
+    with warnings.catch_warnings():
+        # e.g. decoders stopped at maxiter, on purpose
+        warnings.simplefilter("ignore")
+        fn, work = case.setup(**case.params)
+        for _ in range(warmup):
+            fn()
+        times = np.empty(repeat)
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times[i] = time.perf_counter() - t0
+
+        peak = None
+        if memory:
+            tracemalloc.start()
+            try:
+                fn()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+    p50, p90, p99 = np.percentile(times, [50, 90, 99])
+    result = {"id": case.id, "name": case.name, "params": case.params,
+              "repeat": repeat, "mean_s": times.mean(), "min_s": times.min(),
+              "p50_s": p50, "p90_s": p90, "p99_s": p99}
+    for unit, amount in work.items():
+        result["%s_per_s" % unit] = amount / p50
+    result["peak_traced_bytes"] = peak
+    return {key: _plain(value) for key, value in result.items()}
+
+
+def _plain(value):
+    # numpy scalars to JSON serializable Python numbers
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def environment():
+    """Return the versions and machine description stored with a report."""
+    import numba
+    meta = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__, "numba": numba.__version__,
+            "numba_threads": numba.config.NUMBA_NUM_THREADS}
+    try:
+        import torch
+        meta["torch"] = torch.__version__
+    except ImportError:
+        pass
+    return meta
+
+
+def run(cases, repeat=10, warmup=1, memory=True, pattern=None,
+        verbose=True):
+    """Run benchmark cases and return a report.
+
+    Parameters
+    ----------
+    cases: list of Case.
+    repeat, warmup, memory: see `run_case`.
+    pattern: str, default None. Regular expression; only the cases whose id
+        matches it are run.
+    verbose: boolean, default True. If True, print each result.
+
+    Returns
+    -------
+    report: dict with keys "meta" (see `environment`) and "results", the
+        list of the `run_case` results.
+
+    """
+    if pattern is not None:
+        cases = [case for case in cases if re.search(pattern, case.id)]
+    results = []
+    for case in cases:
+        result = run_case(case, repeat=repeat, warmup=warmup, memory=memory)
+        if verbose:
+            print(_summary(result), flush=True)
+        results.append(result)
+    return {"meta": environment(), "results": results}
+
+
+def _summary(result):
+    rates = ", ".join("%.4g %s" % (value, key)
+                      for key, value in result.items()
+                      if key.endswith("_per_s"))
+    memory = result["peak_traced_bytes"]
+    return "%-60s p50 %9.3f ms  p99 %9.3f ms  %s%s" % (
+        result["id"], 1e3 * result["p50_s"], 1e3 * result["p99_s"], rates,
+        "" if memory is None else "  traced peak %.1f MB" % (memory / 2 ** 20))
+
+
+def save(report, path):
+    """Write a report as JSON."""
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
+
+
+def load(path):
+    """Read a report written by `save`."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.1, metric="p50_s"):
+    """Compare the latencies of a report with a baseline report.
+
+    Parameters
+    ----------
+    baseline: dict. Report of `run` (or `load`) taken as reference.
+    current: dict. Report to check.
+    threshold: float, default 0.1. Relative slowdown above which a case is
+        flagged: "slower" if current > (1 + threshold) * baseline, "faster"
+        if current < baseline / (1 + threshold).
+    metric: str, default "p50_s". Latency compared.
+
+    Returns
+    -------
+    rows: list of dict with keys "id", "baseline", "current", "ratio" and
+        "status", one of "ok", "slower", "faster", "new" (not in the
+        baseline) and "missing" (not in the current report).
+
+    """
+    reference = {result["id"]: result[metric]
+                 for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        value = result[metric]
+        base = reference.pop(result["id"], None)
+        if base is None:
+            rows.append({"id": result["id"], "baseline": None,
+                         "current": value, "ratio": None, "status": "new"})
+            continue
+        ratio = value / base
+        if ratio > 1 + threshold:
+            status = "slower"
+        elif ratio < 1 / (1 + threshold):
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({"id": result["id"], "baseline": base, "current": value,
+                     "ratio": ratio, "status": status})
+    for case_id, base in reference.items():
+        rows.append({"id": case_id, "baseline": base, "current": None,
+                     "ratio": None, "status": "missing"})
+    return rows
+
+
+def print_comparison(rows):
+    """Print the rows returned by `compare` as a table."""
+    print("%-60s %12s %12s %8s  %s" % ("case", "baseline", "current",
+                                       "ratio", "status"))
+    for row in rows:
+        print("%-60s %12s %12s %8s  %s" % (
+            row["id"],
+            "-" if row["baseline"] is None else "%.4g" % row["baseline"],
+            "-" if row["current"] is None else "%.4g" % row["current"],
+            "-" if row["ratio"] is None else "%.3f" % row["ratio"],
+            row["status"]))